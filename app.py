@@ -1,11 +1,43 @@
 from flask import Flask, redirect, render_template, request
 import joblib
 import numpy as np
+import openpyxl
 import pandas as pd
 import os
-from datetime import datetime
-from flask import Flask, redirect, render_template, request, send_file, session
-from io import BytesIO
+import atexit
+import bisect
+import click
+import cProfile
+import csv
+import functools
+import hashlib
+import hmac
+import io
+import json
+import math
+import pstats
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape as xml_escape
+from openpyxl.utils.exceptions import InvalidFileException
+from flask import (Flask, Response, before_render_template, jsonify, redirect, render_template,
+                   request, session, stream_with_context, template_rendered, url_for)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, SQLite still serializes the writes
+    fcntl = None
 
 # Get the absolute path to the app directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,7 +47,159 @@ app = Flask(__name__,
             template_folder=os.path.join(BASE_DIR, 'templates'),
             static_folder=os.path.join(BASE_DIR, 'static'))
 app.secret_key = "super-secret-key"
-EXCEL_PATH = os.path.join(BASE_DIR, "Effort_Estimation_Grooming_Implementation_FINAL.xlsx")
+# Workbooks and the store live here (models and templates stay next to app.py)
+DATA_DIR = os.environ.get("EFFORT_DATA_DIR", BASE_DIR)
+
+EXCEL_PATH = os.path.join(DATA_DIR, "Effort_Estimation_Grooming_Implementation_FINAL.xlsx")
+
+# ================= METRICS =================
+# Hot paths are timed as spans (model_load, feature_vector, predict,
+# workbook_read/workbook_write with file and sheet, xlsx_read/xlsx_write,
+# render) and every request as a whole; both are served as Prometheus
+# histograms on /metrics. With EFFORT_SLOW_REQUEST_MS set, requests slower
+# than that are logged with their span breakdown, as JSON lines, to
+# EFFORT_SLOW_REQUEST_LOG (stdout when unset).
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_MS = float(os.environ.get("EFFORT_SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_LOG = os.environ.get("EFFORT_SLOW_REQUEST_LOG", "")
+
+
+def _metric_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Histogram:
+    """A Prometheus histogram: bucket counts, sum and count per label set."""
+
+    def __init__(self, name, help_text, buckets=METRIC_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # labels → [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        """The histogram in the Prometheus text format, as a list of lines."""
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_metric_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_metric_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_metric_labels(key)} {count}")
+        return lines
+
+
+span_seconds = Histogram("effort_span_seconds", "Time spent in instrumented hot paths, by span.")
+request_seconds = Histogram("effort_request_seconds", "HTTP request duration, by endpoint.")
+
+# The spans recorded for the request being served on this thread (None outside requests)
+_trace = threading.local()
+
+
+def current_trace():
+    return getattr(_trace, "spans", None)
+
+
+def record_span(name, seconds, **labels):
+    span_seconds.observe(seconds, span=name, **labels)
+    spans = current_trace()
+    if spans is not None:
+        spans.append((name, labels, seconds))
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block as one `name` span, e.g. span("workbook_read", file=..., sheet=...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started, **labels)
+
+
+@app.before_request
+def _start_trace():
+    _trace.spans = []
+    _trace.started = time.perf_counter()
+
+
+@app.after_request
+def _finish_trace(response):
+    spans = current_trace()
+    if spans is None:
+        return response
+    elapsed = time.perf_counter() - _trace.started
+    _trace.spans = None
+    request_seconds.observe(
+        elapsed, endpoint=request.endpoint or "none", method=request.method, status=response.status_code
+    )
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        log_slow_request(elapsed, response.status_code, spans)
+    return response
+
+
+@app.teardown_request
+def _drop_trace(exc=None):
+    _trace.spans = None
+
+
+_slow_log_lock = threading.Lock()
+
+
+def log_slow_request(elapsed, status, spans):
+    """Write one slow request, with the time of each span and the time no span covers."""
+    covered = sum(seconds for _, _, seconds in spans)
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "method": request.method,
+        "path": request.path,
+        "status": status,
+        "duration_ms": round(elapsed * 1000, 2),
+        "spans": [{"span": name, **labels, "ms": round(seconds * 1000, 2)} for name, labels, seconds in spans],
+        "other_ms": round(max(elapsed - covered, 0) * 1000, 2),
+    }
+    line = json.dumps(entry, default=str)
+    with _slow_log_lock:
+        if SLOW_REQUEST_LOG:
+            with open(SLOW_REQUEST_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(f"Slow request: {line}")
+
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    _trace.render_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    started = getattr(_trace, "render_started", None)
+    if started is None:
+        return
+    _trace.render_started = None
+    record_span("render", time.perf_counter() - started, template=template.name)
+
 
 # Load models with fallback if files don't exist
 grooming_model = None
@@ -26,7 +210,8 @@ IMPLEMENTATION_FEATURES = []
 try:
     grooming_path = os.path.join(BASE_DIR, "grooming_effort_model.pkl")
     if os.path.exists(grooming_path):
-        grooming_model = joblib.load(grooming_path)
+        with span("model_load", file=os.path.basename(grooming_path)):
+            grooming_model = joblib.load(grooming_path)
         GROOMING_FEATURES = list(grooming_model.feature_names_in_)
 except Exception as e:
     print(f"Warning: Could not load grooming model: {e}")
@@ -34,7 +219,8 @@ except Exception as e:
 try:
     impl_path = os.path.join(BASE_DIR, "impl_effort_model.pkl")
     if os.path.exists(impl_path):
-        implementation_model = joblib.load(impl_path)
+        with span("model_load", file=os.path.basename(impl_path)):
+            implementation_model = joblib.load(impl_path)
         IMPLEMENTATION_FEATURES = list(implementation_model.feature_names_in_)
 except Exception as e:
     print(f"Warning: Could not load implementation model: {e}")
@@ -58,31 +244,556 @@ CA_FILE_MAP = {
 def get_ca_excel_path(ca_value):
     """Return path to the CA-specific Excel file, or None if CA unknown."""
     safe_name = CA_FILE_MAP.get(ca_value, "")
-    return os.path.join(BASE_DIR, f"CA_{safe_name}.xlsx") if safe_name else None
+    return os.path.join(DATA_DIR, f"CA_{safe_name}.xlsx") if safe_name else None
+
+# ================= MODEL REGISTRY =================
+GLOBAL_MODEL_FILES = {"grooming": "grooming_effort_model.pkl", "implementation": "impl_effort_model.pkl"}
+
+
+class ModelEntry:
+    """A loaded model together with the file state it was loaded from."""
+
+    def __init__(self, path, mtime_ns, size, model, digest):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.model = model
+        self.digest = digest  # sha256 of the pickle file
+        self.features = list(model.feature_names_in_)
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+
+class ModelRegistry:
+    """
+    Keeps each pickled model in memory, keyed by file path.
+
+    A file is loaded synchronously only the first time it is needed. When it
+    later changes on disk, requests keep getting the current entry while the
+    new version is loaded, validated and warmed in the background; it is
+    then swapped in with a single assignment. model and features live on the
+    same entry, so a request never mixes an old model with new features.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._digests = weakref.WeakKeyDictionary()
+        self._reload_listeners = []
+        self._rejected = {}  # path → (mtime_ns, size, reason) of a version that failed validation
+        self._pending = set()
+        self._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-reload")
+        self.validate = None  # validate(path, model) raises ValueError for an unusable model
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _is_current(entry, st):
+        return entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size
+
+    def _check_rejected(self, path, st):
+        rejected = self._rejected.get(path)
+        if rejected and rejected[:2] == (st.st_mtime_ns, st.st_size):
+            raise ValueError(f"{os.path.basename(path)} was rejected: {rejected[2]}")
+
+    def get(self, path):
+        """
+        Return the ModelEntry for path, loading it on first use.
+        Raises if the file cannot be used; a rejected file is not read
+        again until it changes on disk. A loaded model keeps serving while
+        its file is briefly missing (e.g. replaced with rm + cp).
+        """
+        entry = self._entries.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            if entry is None:
+                raise
+            return entry
+        if entry is None:
+            self._check_rejected(path, st)
+            # Only one thread loads a given file; the others wait and reuse it
+            with self._path_lock(path):
+                entry = self._entries.get(path)
+                if entry is None:
+                    self._check_rejected(path, st)
+                    try:
+                        entry = self._load(path)
+                    except Exception as e:
+                        self._rejected[path] = (st.st_mtime_ns, st.st_size, str(e))
+                        print(f"Warning: Could not load model {path}: {e}")
+                        raise
+                    self._swap(path, entry)
+            return entry
+
+        if not self._is_current(entry, st) and self._rejected.get(path, ())[:2] != (st.st_mtime_ns, st.st_size):
+            with self._lock:
+                if path not in self._pending:
+                    self._pending.add(path)
+                    self._reloader.submit(self._background_reload, path)
+        return entry
+
+    def _background_reload(self, path):
+        try:
+            status = self.reload(path)
+            if status != "reloaded" and status != "unchanged":
+                print(f"Warning: Kept the current model for {path}: {status}")
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def _load(self, path):
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        with span("model_load", file=os.path.basename(path)):
+            model = joblib.load(io.BytesIO(data))
+        if self.validate:
+            self.validate(path, model)
+        check_predictor(model)
+        return ModelEntry(path, st.st_mtime_ns, st.st_size, model, hashlib.sha256(data).hexdigest())
+
+    def _swap(self, path, entry):
+        previous = self._entries.get(path)
+        self._digests[entry.model] = entry.digest
+        self._entries[path] = entry
+        self._rejected.pop(path, None)
+        if previous is not None:
+            for listener in self._reload_listeners:
+                listener(previous, entry)
+
+    def reload(self, path, force=False):
+        """
+        Load path again if it changed (or force=True), validate the new model
+        and check its compiled predictor against predict(), then swap it in.
+        The current entry keeps serving until the swap, and is kept if
+        anything fails.
+        Returns "reloaded", "unchanged", "missing" or "rejected: <reason>".
+        """
+        if not os.path.exists(path):
+            return "missing"
+        with self._path_lock(path):
+            st = os.stat(path)
+            entry = self._entries.get(path)
+            if entry and self._is_current(entry, st) and not force:
+                return "unchanged"
+            try:
+                new_entry = self._load(path)
+            except Exception as e:
+                self._rejected[path] = (st.st_mtime_ns, st.st_size, str(e))
+                return f"rejected: {e}"
+            self._swap(path, new_entry)
+            return "reloaded"
+
+    def adopt(self, path, model):
+        """Register a model that was already loaded from path (e.g. the global models)."""
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with self._path_lock(path):
+            if path not in self._entries:
+                self._swap(path, ModelEntry(path, st.st_mtime_ns, st.st_size, model, digest))
+
+    def peek(self, path):
+        """The current entry for path, without loading or checking the file."""
+        return self._entries.get(path)
+
+    def digest_of(self, model):
+        """sha256 of the file a model was loaded from, or None if it is unknown."""
+        return self._digests.get(model)
+
+    def on_reload(self, listener):
+        """Call listener(old_entry, new_entry) whenever a loaded model is swapped."""
+        self._reload_listeners.append(listener)
+
+    def status(self):
+        return {
+            os.path.basename(path): {
+                "sha256": entry.digest,
+                "features": len(entry.features),
+                "loaded_at": entry.loaded_at,
+                "rejected": self._rejected.get(path, (None, None, None))[2],
+            }
+            for path, entry in sorted(self._entries.items())
+        }
+
+
+model_registry = ModelRegistry()
+
+for _model, _name in ((grooming_model, GLOBAL_MODEL_FILES["grooming"]),
+                      (implementation_model, GLOBAL_MODEL_FILES["implementation"])):
+    if _model is not None:
+        model_registry.adopt(os.path.join(BASE_DIR, _name), _model)
+
+
+def _update_global_model(old_entry, new_entry):
+    """Keep the module-level globals in step when a global model is swapped."""
+    global grooming_model, implementation_model, GROOMING_FEATURES, IMPLEMENTATION_FEATURES
+    name = os.path.basename(new_entry.path)
+    if name == GLOBAL_MODEL_FILES["grooming"]:
+        grooming_model, GROOMING_FEATURES = new_entry.model, new_entry.features
+    elif name == GLOBAL_MODEL_FILES["implementation"]:
+        implementation_model, IMPLEMENTATION_FEATURES = new_entry.model, new_entry.features
+
+
+model_registry.on_reload(_update_global_model)
+
+
+def get_ca_model_path(ca_value, model_type):
+    """Return path to grooming_<CA>_model.pkl / impl_<CA>_model.pkl, or None if CA unknown."""
+    safe_name = CA_FILE_MAP.get(ca_value, "")
+    if not safe_name:
+        return None
+    if model_type == "grooming":
+        return os.path.join(BASE_DIR, f"grooming_{safe_name}_model.pkl")
+    return os.path.join(BASE_DIR, f"impl_{safe_name}_model.pkl")
+
+
+def model_file_paths():
+    """Every model file the app can use (global and CA-specific) that exists on disk."""
+    paths = [os.path.join(BASE_DIR, name) for name in GLOBAL_MODEL_FILES.values()]
+    paths += [
+        get_ca_model_path(ca_value, model_type)
+        for ca_value in CA_FILE_MAP for model_type in ("grooming", "implementation")
+    ]
+    return [path for path in paths if os.path.exists(path)]
+
 
 def load_ca_model(ca_value, model_type):
     """
     Return (model, features, is_ca_specific).
-    Looks for grooming_<CA>_model.pkl / impl_<CA>_model.pkl.
+    Looks for grooming_<CA>_model.pkl / impl_<CA>_model.pkl in the model registry.
     Falls back to the global model if no CA-specific file exists.
     """
-    safe_name = CA_FILE_MAP.get(ca_value, "")
-    if safe_name:
-        if model_type == "grooming":
-            ca_path = os.path.join(BASE_DIR, f"grooming_{safe_name}_model.pkl")
-        else:
-            ca_path = os.path.join(BASE_DIR, f"impl_{safe_name}_model.pkl")
-        if os.path.exists(ca_path):
-            try:
-                m = joblib.load(ca_path)
-                return m, list(m.feature_names_in_), True
-            except Exception:
-                pass
+    ca_path = get_ca_model_path(ca_value, model_type)
+    if ca_path and os.path.exists(ca_path):
+        try:
+            entry = model_registry.get(ca_path)
+            return entry.model, entry.features, True
+        except Exception:
+            pass
+    entry = model_registry.peek(os.path.join(BASE_DIR, GLOBAL_MODEL_FILES[model_type]))
+    if entry:
+        # Triggers a background reload if the global pickle was replaced
+        entry = model_registry.get(entry.path)
+        return entry.model, entry.features, False
     if model_type == "grooming":
         return grooming_model, GROOMING_FEATURES, False
     return implementation_model, IMPLEMENTATION_FEATURES, False
 
 
+# ================= INFERENCE =================
+# Single-row predict() on an XGBRegressor is dominated by Python/DMatrix
+# overhead, so models are compiled into a lighter predictor when first used.
+# EFFORT_INFERENCE_BACKEND picks it:
+#   numpy   — trees flattened into arrays and walked with NumPy (default)
+#   inplace — xgboost's native inplace_predict on the raw matrix
+#   sklearn — the model's own predict()
+# `flask check-inference` confirms every backend matches predict().
+INFERENCE_BACKENDS = ("numpy", "inplace", "sklearn")
+INFERENCE_BACKEND = os.environ.get("EFFORT_INFERENCE_BACKEND", "numpy")
+if INFERENCE_BACKEND not in INFERENCE_BACKENDS:
+    print(f"Warning: Unknown EFFORT_INFERENCE_BACKEND '{INFERENCE_BACKEND}', using 'sklearn'")
+    INFERENCE_BACKEND = "sklearn"
+
+# Batches larger than this skip the NumPy walk ("numpy" backend only)
+NUMPY_MAX_ROWS = 16
+
+# Objectives whose prediction is the raw sum of the trees
+_IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+def iteration_range(model):
+    """
+    The trees predict() uses: (0, best_iteration + 1) for an early-stopped
+    model, else (0, 0), which means every tree.
+    """
+    try:
+        return (0, model.best_iteration + 1)
+    except AttributeError:
+        return (0, 0)
+
+
+class CompiledTrees:
+    """
+    A gbtree regressor flattened into (trees × nodes) NumPy arrays.
+    predict() walks every tree at once, one level per step, so a single row
+    costs a handful of array operations instead of a DMatrix round trip.
+    """
+
+    def __init__(self, model):
+        booster = model.get_booster()
+        config = json.loads(booster.save_config())["learner"]
+        if config["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"unsupported booster {config['gradient_booster']['name']}")
+        if config["objective"]["name"] not in _IDENTITY_OBJECTIVES:
+            raise ValueError(f"unsupported objective {config['objective']['name']}")
+        # Stored as e.g. "[3.362284E1]" by recent xgboost versions
+        self.base_score = float(str(config["learner_model_param"]["base_score"]).strip("[]"))
+
+        trees = booster.trees_to_dataframe()
+        _, end = iteration_range(model)
+        if end:
+            trees = trees[trees["Tree"] < end]
+
+        columns = {name: i for i, name in enumerate(model.feature_names_in_)}
+        n_trees, n_nodes = int(trees["Tree"].max()) + 1, int(trees["Node"].max()) + 1
+        tree, node = trees["Tree"].to_numpy(), trees["Node"].to_numpy()
+        is_leaf = (trees["Feature"] == "Leaf").to_numpy()
+
+        def child(col):
+            ids = trees[col].where(~is_leaf, "0-0").str.split("-").str[1].astype(int).to_numpy()
+            links = np.tile(np.arange(n_nodes, dtype=np.int32), (n_trees, 1))  # leaves point to themselves
+            links[tree[~is_leaf], node[~is_leaf]] = ids[~is_leaf]
+            return links
+
+        self.left, self.right, self.missing = child("Yes"), child("No"), child("Missing")
+        self.feature = np.zeros((n_trees, n_nodes), dtype=np.int32)
+        self.feature[tree[~is_leaf], node[~is_leaf]] = trees["Feature"][~is_leaf].map(columns).to_numpy()
+        self.threshold = np.zeros((n_trees, n_nodes), dtype=np.float32)
+        self.threshold[tree[~is_leaf], node[~is_leaf]] = trees["Split"][~is_leaf].to_numpy()
+        self.value = np.zeros((n_trees, n_nodes), dtype=np.float32)
+        self.value[tree[is_leaf], node[is_leaf]] = trees["Gain"][is_leaf].to_numpy()
+
+        # Children are numbered after their parent, so one pass gives every depth
+        depth = np.zeros((n_trees, n_nodes), dtype=np.int32)
+        for t, n, leaf in sorted(zip(tree, node, is_leaf), key=lambda x: x[1]):
+            if not leaf:
+                for links in (self.left, self.right):
+                    depth[t, links[t, n]] = depth[t, n] + 1
+        self.depth = int(depth.max())
+
+        # Flatten to 1-D with absolute node positions: one take() per lookup
+        offsets = (np.arange(n_trees, dtype=np.int32) * n_nodes)[:, None]
+        self.roots = offsets.ravel()
+        self.left, self.right, self.missing = (
+            (links + offsets).ravel() for links in (self.left, self.right, self.missing)
+        )
+        self.feature, self.threshold, self.value = (
+            a.ravel() for a in (self.feature, self.threshold, self.value)
+        )
+
+    def predict(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        n_features = matrix.shape[1]
+        flat = matrix.ravel()
+        row_starts = (np.arange(len(matrix)) * n_features)[:, None]
+        has_missing = np.isnan(flat).any()
+        idx = np.broadcast_to(self.roots, (len(matrix), len(self.roots)))
+        for _ in range(self.depth):
+            x = flat.take(row_starts + self.feature.take(idx))
+            step = np.where(x < self.threshold.take(idx), self.left.take(idx), self.right.take(idx))
+            idx = np.where(np.isnan(x), self.missing.take(idx), step) if has_missing else step
+        return (self.value.take(idx).sum(axis=1, dtype=np.float64) + self.base_score).astype(np.float32)
+
+
+def compile_model(model, backend=None):
+    """Return a predict(matrix) function for model using the given (or configured) backend."""
+    backend = backend or INFERENCE_BACKEND
+    if backend == "sklearn":
+        return model.predict
+
+    booster = model.get_booster()
+    trees = iteration_range(model)
+
+    def inplace_predict(matrix):
+        return booster.inplace_predict(np.asarray(matrix, dtype=np.float32), iteration_range=trees)
+
+    if backend == "inplace":
+        return inplace_predict
+
+    compiled = CompiledTrees(model)
+
+    def numpy_predict(matrix):
+        # Walking trees in NumPy wins for a few rows; big batches go to xgboost
+        if len(matrix) > NUMPY_MAX_ROWS:
+            return inplace_predict(matrix)
+        return compiled.predict(matrix)
+
+    return numpy_predict
+
+
+def check_predictor(model, tolerance=1e-3):
+    """
+    Raise ValueError unless the EFFORT_INFERENCE_BACKEND predictor built for
+    model (see compile_model) agrees with model.predict() on one sample row
+    and on a batch larger than NUMPY_MAX_ROWS.
+    """
+    rng = np.random.default_rng(0)
+    matrix = rng.integers(0, 12, size=(NUMPY_MAX_ROWS + 4, model.n_features_in_)).astype(float)
+    matrix[rng.random(matrix.shape) < 0.05] = np.nan
+    predictor = get_predictor(model)
+    expected = model.predict(matrix)
+    for got, want in ((predictor(matrix[:1]), expected[:1]), (predictor(matrix), expected)):
+        diff = float(np.max(np.abs(np.asarray(got) - want)))
+        if not diff <= tolerance:
+            raise ValueError(f"'{INFERENCE_BACKEND}' inference differs from predict() by {diff:.3g}")
+
+
+_predictors = weakref.WeakKeyDictionary()
+_predictors_lock = threading.Lock()
+
+
+def get_predictor(model):
+    """
+    Compiled predict function for a loaded model, built once per model object
+    (a reloaded pickle is a new object and is compiled again).
+    Falls back to model.predict if the model cannot be compiled.
+    """
+    predictor = _predictors.get(model)
+    if predictor is None:
+        with _predictors_lock:
+            predictor = _predictors.get(model)
+            if predictor is None:
+                try:
+                    predictor = compile_model(model)
+                except Exception as e:
+                    print(f"Warning: Could not compile model for '{INFERENCE_BACKEND}' inference: {e}")
+                    predictor = model.predict
+                _predictors[model] = predictor
+    return predictor
+
+
+# ================= PREDICTION CACHE =================
+# Many stories share the exact same feature vector, so predictions are
+# memoized per (CA, model type, model file sha256, feature values).
+# A changed pickle has a new hash, and its old entries are dropped on reload.
+PREDICTION_CACHE_SIZE = int(os.environ.get("EFFORT_PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("EFFORT_PREDICTION_CACHE_TTL", "3600"))
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with a time-to-live; size 0 disables it."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get_many(self, keys):
+        """Return the cached value (or None) for each key."""
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                item = self._entries.get(key)
+                if item is not None and now - item[1] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    item = None
+                if item is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values.append(item[0])
+        return values
+
+    def put_many(self, items):
+        if self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, digest):
+        """Drop every prediction made by the model file with this sha256."""
+        with self._lock:
+            stale = [key for key in self._entries if key[2] == digest]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+model_registry.on_reload(
+    lambda old_entry, new_entry: old_entry.digest != new_entry.digest and prediction_cache.invalidate(old_entry.digest)
+)
+
+
+# ================= WARM-UP =================
+# When a process starts serving (see BACKGROUND TASKS), every CA model is
+# loaded into the registry (in parallel) and each model runs one dummy
+# prediction, so the first real requests don't pay for unpickling, compiling
+# and xgboost initialisation. /readyz reports 503 until it is done.
+WARMUP_WORKERS = int(os.environ.get("EFFORT_WARMUP_WORKERS", "4"))
+
+warmup_status = {"ready": False, "started_at": None, "finished_at": None, "models": {}, "errors": {}}
+_warmup_done = threading.Event()
+
+
+def _warm_model(model, features):
+    """Run one dummy prediction; returns the seconds it took."""
+    started = time.perf_counter()
+    get_predictor(model)(np.zeros((1, len(features))))
+    return round(time.perf_counter() - started, 3)
+
+
+def _warm_model_file(path):
+    started = time.perf_counter()
+    entry = model_registry.get(path)
+    _warm_model(entry.model, entry.features)
+    return round(time.perf_counter() - started, 3)
+
+
+def warm_up_models():
+    """Load and warm every model; record the outcome in warmup_status."""
+    warmup_status["started_at"] = datetime.now().isoformat(timespec="seconds")
+
+    paths = model_file_paths()
+    with ThreadPoolExecutor(max_workers=max(WARMUP_WORKERS, 1), thread_name_prefix="model-warmup") as pool:
+        for path, future in [(path, pool.submit(_warm_model_file, path)) for path in paths]:
+            try:
+                warmup_status["models"][os.path.basename(path)] = future.result()
+            except Exception as e:
+                # A broken CA model falls back to the global one at request time
+                warmup_status["errors"][os.path.basename(path)] = str(e)
+                print(f"Warning: Could not warm up {path}: {e}")
+
+    warmup_status["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    warmup_status["ready"] = True
+    _warmup_done.set()
+
+
+def start_warm_up():
+    """Warm the models in the background (set EFFORT_WARMUP=0 to skip)."""
+    if os.environ.get("EFFORT_WARMUP", "1") == "0":
+        warmup_status["ready"] = True
+        _warmup_done.set()
+        return
+    threading.Thread(target=warm_up_models, name="model-warmup", daemon=True).start()
+
+
 # ================= UTIL =================
 def safe(v):
     try:
@@ -97,60 +808,1343 @@ def clean_note(text):
     text = text.replace("&", "and")    # prevent XML corruption
     return text[:1000]                 # limit size
 
-def save_to_sheet(sheet_name, row_dict, excel_path=None):
+# ================= STORAGE =================
+# Rows are stored in a SQLite database and only ever appended on save.
+# The .xlsx workbooks are exports of the database: they are rewritten in
+# the background after writes (or on demand via `flask export-workbooks`).
+# All writes go through one writer thread per process (see WRITE QUEUE);
+# the .xlsx files themselves are only touched under an advisory file lock.
+DB_PATH = os.path.join(DATA_DIR, "effort_estimation.db")
+EXPORT_INTERVAL = float(os.environ.get("EFFORT_EXPORT_INTERVAL", "5"))
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version)
+SCHEMA_MIGRATIONS = [
+    (
+        """CREATE TABLE workbooks (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            exported_version INTEGER NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE sheets (
+            workbook TEXT NOT NULL,
+            sheet TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (workbook, sheet)
+        )""",
+        """CREATE TABLE sheet_columns (
+            workbook TEXT NOT NULL,
+            sheet TEXT NOT NULL,
+            key TEXT NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (workbook, sheet, key)
+        )""",
+        """CREATE TABLE sheet_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            workbook TEXT NOT NULL,
+            sheet TEXT NOT NULL,
+            data TEXT NOT NULL
+        )""",
+        "CREATE INDEX sheet_rows_by_sheet ON sheet_rows (workbook, sheet, id)",
+    ),
+    (
+        # Feature index: normalized Feature_ID / lower-cased Feature_Name per row
+        "ALTER TABLE sheet_rows ADD COLUMN feature_id_key TEXT NOT NULL DEFAULT ''",
+        "ALTER TABLE sheet_rows ADD COLUMN feature_name_key TEXT NOT NULL DEFAULT ''",
+        "CREATE INDEX sheet_rows_by_feature_id ON sheet_rows (workbook, sheet, feature_id_key)",
+        "CREATE INDEX sheet_rows_by_feature_name ON sheet_rows (workbook, sheet, feature_name_key)",
+        lambda conn: _backfill_feature_keys(conn),
+    ),
+    (
+        # Soft deletes: a deleted row keeps its data until `flask compact-store`
+        "ALTER TABLE sheet_rows ADD COLUMN deleted_at TEXT",
+        "CREATE INDEX sheet_rows_by_feature ON sheet_rows (feature_id_key)",
+    ),
+    (
+        # Effort aggregates per CA / feature (see AGGREGATES)
+        """CREATE TABLE effort_aggregates (
+            metric TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total REAL NOT NULL,
+            histogram TEXT NOT NULL,
+            PRIMARY KEY (metric, scope, key)
+        )""",
+        lambda conn: _rebuild_aggregates(conn),
+    ),
+    (
+        # Write-behind journal entries already applied (see WRITE-BEHIND JOURNAL)
+        "CREATE TABLE journal_applied (entry_id TEXT PRIMARY KEY)",
+    ),
+]
+
+_db_local = threading.local()
+_known_workbooks = set()
+
+
+def get_db():
+    """Return this thread's SQLite connection, creating and migrating it on first use."""
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # A commit only returns once it is on disk
+        conn.execute("PRAGMA synchronous=FULL")
+        _migrate(conn)
+        _db_local.conn = conn
+    return conn
+
+
+def _migrate(conn):
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(SCHEMA_MIGRATIONS):
+            conn.execute("COMMIT")
+            return
+        try:
+            for statement in SCHEMA_MIGRATIONS[version]:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@contextmanager
+def db_transaction(immediate=True):
+    """
+    Run a block inside one SQLite transaction.
+    immediate=True takes the write lock up front (use it for writes).
+    """
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ================= WRITE QUEUE =================
+# Mutations are queued and applied in order by a single writer thread, each in
+# its own transaction. Between processes (e.g. gunicorn workers), SQLite's
+# write lock orders the writer threads.
+_write_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+
+
+def _writer_loop():
+    while True:
+        mutation, future, spans = _write_queue.get()
+        if not future.set_running_or_notify_cancel():
+            continue
+        # Spans inside the mutation count toward the request that queued it
+        _trace.spans = spans
+        try:
+            with db_transaction() as conn:
+                result = mutation(conn)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            _trace.spans = None
+
+
+def submit_write(mutation):
+    """
+    Queue mutation(conn) for the writer thread.
+    Returns a Future that resolves once its transaction is committed.
+    """
+    global _writer_thread
+    future = Future()
 
-    path = excel_path or EXCEL_PATH
-    new_row_df = pd.DataFrame([row_dict])
+    if threading.current_thread() is _writer_thread:
+        # Called from inside another mutation: already in its transaction
+        future.set_result(mutation(get_db()))
+        return future
 
-    if os.path.exists(path):
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_writer_loop, name="store-writer", daemon=True)
+            _writer_thread.start()
+    _write_queue.put((mutation, future, current_trace()))
+    return future
 
+
+def run_write(mutation):
+    """Apply mutation(conn) through the writer thread and wait until it is durable."""
+    return submit_write(mutation).result()
+
+
+@contextmanager
+def workbook_file_lock(workbook):
+    """
+    Hold an exclusive advisory lock on a workbook's .xlsx file, so no two
+    threads or processes read or replace it at the same time.
+    """
+    with open(os.path.join(DATA_DIR, f".{workbook}.lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
         try:
-            existing_df = pd.read_excel(path, sheet_name=sheet_name)
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-            # ---- Normalize existing columns (for comparison only) ----
-            existing_cols_map = {
-                col.strip().lower(): col
-                for col in existing_df.columns
-            }
 
-            # ---- Rename new_row_df columns to match existing ones ----
-            for col in new_row_df.columns:
-                col_lower = col.strip().lower()
-                if col_lower in existing_cols_map:
-                    # Rename to exact existing column name
-                    new_row_df.rename(
-                        columns={col: existing_cols_map[col_lower]},
-                        inplace=True
-                    )
+def workbook_key(excel_path=None):
+    """Workbooks are stored under their file name (e.g. CA_TRSOAM.xlsx)."""
+    return os.path.basename(excel_path or EXCEL_PATH)
 
-            # ---- Ensure no duplicate columns ----
-            new_row_df = new_row_df.loc[:, ~new_row_df.columns.duplicated()]
-            existing_df = existing_df.loc[:, ~existing_df.columns.duplicated()]
 
-            combined_df = pd.concat([new_row_df, existing_df], ignore_index=True)
+def workbook_path(workbook):
+    return os.path.join(DATA_DIR, workbook)
 
-        except (KeyError, ValueError):
-            # Sheet does not exist yet in this file — start fresh
-            combined_df = new_row_df
 
-        try:
-            with pd.ExcelWriter(path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-                combined_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        except PermissionError:
-            raise PermissionError(
-                f"Cannot save to '{path}'. The file is open in another program (e.g. Excel). "
-                "Please close it and try again."
+def _to_cell(value):
+    """Convert a pandas/numpy value to something JSON can store."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (bool, int, float)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+def _ensure_workbook(excel_path=None):
+    """
+    Make sure the workbook is known to the store.
+    The first time a workbook is seen, its existing .xlsx (if any) is imported.
+    """
+    workbook = workbook_key(excel_path)
+    if workbook in _known_workbooks:
+        return workbook
+
+    known = get_db().execute("SELECT 1 FROM workbooks WHERE name = ?", (workbook,)).fetchone()
+    if not known:
+        path = workbook_path(workbook)
+        frames = {}
+        with workbook_file_lock(workbook):
+            if os.path.exists(path):
+                with span("xlsx_read", file=workbook):
+                    frames = pd.read_excel(path, sheet_name=None)
+
+        def import_workbook(conn):
+            # Another worker may have imported it in the meantime
+            if conn.execute("SELECT 1 FROM workbooks WHERE name = ?", (workbook,)).fetchone():
+                return
+            for sheet_name, df in frames.items():
+                with span("workbook_write", file=workbook, sheet=sheet_name):
+                    _insert_frame(conn, workbook, sheet_name, df)
+            conn.execute(
+                "INSERT INTO workbooks (name, version, exported_version) VALUES (?, 0, 0)",
+                (workbook,)
             )
 
+        run_write(import_workbook)
+
+    _known_workbooks.add(workbook)
+    return workbook
+
+
+def _feature_keys(data):
+    """
+    Index keys of a stored row: (Feature_ID stripped, Feature_Name stripped and
+    lower-cased), matching how the routes compare them.
+    """
+    feature_id = feature_name = None
+    for col, value in data.items():
+        key = col.strip().lower()
+        if key == "feature_id" and feature_id is None:
+            feature_id = value
+        elif key == "feature_name" and feature_name is None:
+            feature_name = value
+    return (
+        "" if feature_id is None else str(feature_id).strip(),
+        "" if feature_name is None else str(feature_name).strip().lower(),
+    )
+
+
+def _backfill_feature_keys(conn):
+    conn.executemany(
+        "UPDATE sheet_rows SET feature_id_key = ?, feature_name_key = ? WHERE id = ?",
+        [
+            (*_feature_keys(json.loads(data)), row_id)
+            for row_id, data in conn.execute("SELECT id, data FROM sheet_rows").fetchall()
+        ]
+    )
+
+
+def _sheet_columns(conn, workbook, sheet_name):
+    """Return {normalized column name: stored column name} for a sheet."""
+    return {
+        key: name
+        for key, name in conn.execute(
+            "SELECT key, name FROM sheet_columns WHERE workbook = ? AND sheet = ? ORDER BY position",
+            (workbook, sheet_name)
+        )
+    }
+
+
+def _add_sheet(conn, workbook, sheet_name):
+    conn.execute(
+        """INSERT OR IGNORE INTO sheets (workbook, sheet, position)
+           SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM sheets WHERE workbook = ?""",
+        (workbook, sheet_name, workbook)
+    )
+
+
+def _add_column(conn, workbook, sheet_name, key, name):
+    conn.execute(
+        """INSERT INTO sheet_columns (workbook, sheet, key, name, position)
+           SELECT ?, ?, ?, ?, COALESCE(MAX(position) + 1, 0)
+           FROM sheet_columns WHERE workbook = ? AND sheet = ?""",
+        (workbook, sheet_name, key, name, workbook, sheet_name)
+    )
+
+
+def _append_rows(conn, workbook, sheet_name, row_dicts):
+    """
+    Append rows to a sheet. Column names are matched case-insensitively
+    against the existing ones; unknown columns are added to the sheet.
+    """
+    _add_sheet(conn, workbook, sheet_name)
+    columns = _sheet_columns(conn, workbook, sheet_name)
+
+    payloads, stored = [], []
+    for row_dict in row_dicts:
+        data = {}
+        for col, value in row_dict.items():
+            key = str(col).strip().lower()
+            if key not in columns:
+                _add_column(conn, workbook, sheet_name, key, str(col))
+                columns[key] = str(col)
+            # Duplicate columns → the first one wins
+            data.setdefault(columns[key], _to_cell(value))
+        payloads.append((workbook, sheet_name, json.dumps(data), *_feature_keys(data)))
+        stored.append(data)
+
+    conn.executemany(
+        """INSERT INTO sheet_rows (workbook, sheet, data, feature_id_key, feature_name_key)
+           VALUES (?, ?, ?, ?, ?)""",
+        payloads
+    )
+    _update_aggregates(conn, workbook, sheet_name, added=stored)
+
+
+def _insert_frame(conn, workbook, sheet_name, df):
+    """Insert a DataFrame whose first row is the newest (the on-screen order)."""
+    _add_sheet(conn, workbook, sheet_name)
+    for col in df.columns:
+        key = str(col).strip().lower()
+        if key not in _sheet_columns(conn, workbook, sheet_name):
+            _add_column(conn, workbook, sheet_name, key, str(col))
+    # Newest row is on top, so insert bottom-up to keep ids increasing with age
+    _append_rows(conn, workbook, sheet_name, reversed(df.to_dict(orient="records")))
+
+
+def _mark_changed(conn, workbook):
+    conn.execute("UPDATE workbooks SET version = version + 1 WHERE name = ?", (workbook,))
+
+
+_layout_cache = {}
+
+
+def workbook_layout(excel_path=None):
+    """
+    Return {sheet name: [column names]} for a workbook, in workbook order.
+    The layout is loaded in one pass and reused across requests until the
+    workbook's version changes (every write bumps it).
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    version = get_db().execute(
+        "SELECT version FROM workbooks WHERE name = ?", (workbook,)
+    ).fetchone()[0]
+    cached = _layout_cache.get(workbook)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with db_transaction(immediate=False) as conn:
+        version = conn.execute(
+            "SELECT version FROM workbooks WHERE name = ?", (workbook,)
+        ).fetchone()[0]
+        layout = {
+            sheet_name: [] for (sheet_name,) in conn.execute(
+                "SELECT sheet FROM sheets WHERE workbook = ? ORDER BY position", (workbook,)
+            )
+        }
+        for sheet_name, name in conn.execute(
+            "SELECT sheet, name FROM sheet_columns WHERE workbook = ? ORDER BY sheet, position",
+            (workbook,)
+        ):
+            layout[sheet_name].append(name)
+
+    _layout_cache[workbook] = (version, layout)
+    return layout
+
+
+def sheet_names(excel_path=None):
+    """Sheet names of a workbook, in workbook order (like pd.ExcelFile(...).sheet_names)."""
+    return list(workbook_layout(excel_path))
+
+
+def workbook_exists(excel_path=None):
+    return bool(sheet_names(excel_path))
+
+
+def _sheet_frame(conn, workbook, sheet_name):
+    columns = list(_sheet_columns(conn, workbook, sheet_name).values())
+    records = [
+        json.loads(data) for (data,) in conn.execute(
+            """SELECT data FROM sheet_rows WHERE workbook = ? AND sheet = ? AND deleted_at IS NULL
+               ORDER BY id DESC""",
+            (workbook, sheet_name)
+        )
+    ]
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def read_sheet(sheet_name, excel_path=None):
+    """
+    Return a sheet as a DataFrame, newest row first (like pd.read_excel).
+    Raises ValueError if the sheet does not exist.
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    with span("workbook_read", file=workbook, sheet=sheet_name), db_transaction(immediate=False) as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sheets WHERE workbook = ? AND sheet = ?", (workbook, sheet_name)
+        ).fetchone()
+        if not exists:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return _sheet_frame(conn, workbook, sheet_name)
+
+
+class WriteBatch:
+    """
+    Collects every row written by one request, grouped by workbook and sheet,
+    and commits them together: one transaction, and one change (→ one export)
+    per workbook touched.
+
+        with WriteBatch() as batch:
+            batch.add("Grooming", row)
+            batch.add("Grooming", row, excel_path=ca_excel)
+
+    The batch commits when the block exits without an exception.
+    """
+
+    def __init__(self):
+        self._rows = {}
+
+    def add(self, sheet_name, row_dict, excel_path=None):
+        self._rows.setdefault((excel_path or EXCEL_PATH, sheet_name), []).append(row_dict)
+
+    def extend(self, sheet_name, row_dicts, excel_path=None):
+        for row_dict in row_dicts:
+            self.add(sheet_name, row_dict, excel_path=excel_path)
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._rows.values())
+
+    def commit(self):
+        if not self._rows:
+            return
+        groups = [
+            (_ensure_workbook(path), sheet_name, rows)
+            for (path, sheet_name), rows in self._rows.items()
+        ]
+        if WRITE_BEHIND:
+            journal_append(groups)
+            self._rows = {}
+            return
+
+        def append_groups(conn):
+            for workbook, sheet_name, rows in groups:
+                with span("workbook_write", file=workbook, sheet=sheet_name):
+                    _append_rows(conn, workbook, sheet_name, rows)
+            for workbook in {workbook for workbook, _, _ in groups}:
+                _mark_changed(conn, workbook)
+
+        run_write(append_groups)
+        self._rows = {}
+        schedule_export()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+
+def find_feature_rows(sheet_name, feature_id=None, feature_name=None, excel_path=None):
+    """
+    Return the rows of a sheet whose Feature_ID equals feature_id (after strip)
+    or whose Feature_Name equals feature_name (case-insensitive), newest first.
+    feature_id may also be a collection of ids.
+
+    Lookups go through the feature index, so only matching rows are read.
+    The DataFrame index holds the stored row ids. Raises ValueError if the
+    sheet does not exist.
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    layout = workbook_layout(excel_path)
+    if sheet_name not in layout:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    conditions, params = [], []
+    if isinstance(feature_id, str):
+        feature_id = [feature_id]
+    feature_ids = sorted({str(f).strip() for f in feature_id or ()})
+    if feature_ids:
+        conditions.append(f"feature_id_key IN ({', '.join('?' * len(feature_ids))})")
+        params.extend(feature_ids)
+    if feature_name is not None:
+        conditions.append("feature_name_key = ?")
+        params.append(str(feature_name).strip().lower())
+
+    rows = []
+    with span("workbook_read", file=workbook, sheet=sheet_name):
+        if conditions:
+            rows = get_db().execute(
+                f"""SELECT id, data FROM sheet_rows
+                    WHERE workbook = ? AND sheet = ? AND deleted_at IS NULL
+                      AND ({' OR '.join(conditions)})
+                    ORDER BY id DESC""",
+                (workbook, sheet_name, *params)
+            ).fetchall()
+        return _rows_frame(rows, layout[sheet_name])
+
+
+def _rows_frame(rows, columns):
+    """Build a DataFrame from (id, data) rows, indexed by row id."""
+    return pd.DataFrame.from_records(
+        [json.loads(data) for _, data in rows],
+        columns=columns,
+        index=pd.Index([row_id for row_id, _ in rows], dtype="int64"),
+    )
+
+
+def load_feature_snapshot(sheets, query, notes_sheet=None, excel_path=None):
+    """
+    Load everything a feature search needs in a single query: the rows of
+    `sheets` whose Feature_ID or Feature_Name matches query, plus (when
+    notes_sheet is given) the notes attached to the matched features.
+
+    Returns {sheet name: DataFrame} with an entry for every requested sheet.
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    layout = workbook_layout(excel_path)
+    sheets = [sheet_name for sheet_name in sheets if sheet_name in layout]
+    query = str(query).strip()
+
+    snapshot_rows = {sheet_name: [] for sheet_name in sheets}
+    if notes_sheet in layout:
+        snapshot_rows[notes_sheet] = []
+
+    if sheets:
+        placeholders = ", ".join("?" * len(sheets))
+        sql = f"""
+            WITH matched AS (
+                SELECT id, sheet, data, feature_id_key FROM sheet_rows
+                WHERE workbook = ? AND sheet IN ({placeholders}) AND deleted_at IS NULL
+                  AND (feature_id_key = ? OR feature_name_key = ?)
+            )
+            SELECT id, sheet, data FROM matched"""
+        params = [workbook, *sheets, query, query.lower()]
+        if notes_sheet in layout:
+            sql += """
+            UNION ALL
+            SELECT id, sheet, data FROM sheet_rows
+            WHERE workbook = ? AND sheet = ? AND deleted_at IS NULL
+              AND feature_id_key IN (SELECT feature_id_key FROM matched)"""
+            params += [workbook, notes_sheet]
+
+        with span("workbook_read", file=workbook, sheet="+".join(snapshot_rows)):
+            for row_id, sheet_name, data in get_db().execute(sql + " ORDER BY id DESC", params):
+                snapshot_rows[sheet_name].append((row_id, data))
+
+    return {
+        sheet_name: _rows_frame(rows, layout[sheet_name])
+        for sheet_name, rows in snapshot_rows.items()
+    }
+
+
+def _json_path(column):
+    return '$."' + column.replace('"', "") + '"'
+
+
+def query_rows(sheets, excel_path=None, offset=0, limit=50, sort=None, descending=False, filters=None):
+    """
+    Read one page of rows from one or more sheets of a workbook.
+
+    sort is a column name (default: sheet order, then newest first);
+    filters maps column names to case-insensitive substrings.
+    Only the requested slice is decoded.
+    Returns (rows, total): rows is a list of (sheet name, row dict) and
+    total the number of rows matching the filters.
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    layout = workbook_layout(excel_path)
+    sheets = [sheet_name for sheet_name in sheets if sheet_name in layout]
+    if not sheets:
+        return [], 0
+
+    where = [f"workbook = ? AND sheet IN ({', '.join('?' * len(sheets))}) AND deleted_at IS NULL"]
+    params = [workbook, *sheets]
+    for column, value in (filters or {}).items():
+        pattern = str(value).strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("LOWER(CAST(json_extract(data, ?) AS TEXT)) LIKE ? ESCAPE '\\'")
+        params += [_json_path(column), f"%{pattern}%"]
+    where_sql = " AND ".join(where)
+
+    order, order_params = [], []
+    if sort:
+        order.append(f"json_extract(data, ?) {'DESC' if descending else 'ASC'}")
+        order_params.append(_json_path(sort))
+    elif len(sheets) > 1:
+        order.append("CASE sheet " + " ".join("WHEN ? THEN %d" % i for i in range(len(sheets))) + " END")
+        order_params += sheets
+    order.append("id DESC")
+
+    with span("workbook_read", file=workbook, sheet="+".join(sheets)), db_transaction(immediate=False) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM sheet_rows WHERE {where_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT sheet, data FROM sheet_rows WHERE {where_sql} ORDER BY {', '.join(order)} LIMIT ? OFFSET ?",
+            (*params, *order_params, limit, offset)
+        ).fetchall()
+
+    return [(sheet_name, json.loads(data)) for sheet_name, data in rows], total
+
+
+def iter_rows(sheets, excel_path=None, chunk_size=1000):
+    """
+    Yield (sheet name, row dict) for every row of the given sheets, sheet by
+    sheet and newest first. Rows are fetched chunk_size at a time (keyset
+    paging), so memory stays flat however large the sheet is.
+    """
+    sync_journal()
+    workbook = _ensure_workbook(excel_path)
+    for sheet_name in sheets:
+        last_id = None
+        while True:
+            if last_id is None:
+                rows = get_db().execute(
+                    """SELECT id, data FROM sheet_rows
+                       WHERE workbook = ? AND sheet = ? AND deleted_at IS NULL
+                       ORDER BY id DESC LIMIT ?""",
+                    (workbook, sheet_name, chunk_size)
+                ).fetchall()
+            else:
+                rows = get_db().execute(
+                    """SELECT id, data FROM sheet_rows
+                       WHERE workbook = ? AND sheet = ? AND id < ? AND deleted_at IS NULL
+                       ORDER BY id DESC LIMIT ?""",
+                    (workbook, sheet_name, last_id, chunk_size)
+                ).fetchall()
+            if not rows:
+                break
+            for _, data in rows:
+                yield sheet_name, json.loads(data)
+            last_id = rows[-1][0]
+
+
+def save_to_sheet(sheet_name, row_dict, excel_path=None):
+    """Append one row to a sheet. O(1) — existing rows are never re-read."""
+    with WriteBatch() as batch:
+        batch.add(sheet_name, row_dict, excel_path=excel_path)
+
+
+def _edited_cell(old, new):
+    """
+    Return the value to store when a cell holding old is edited to the text
+    new, or None if the edit does not change it (blank cells are shown as "---").
+    Numeric cells stay numeric when the new text is a number.
+    """
+    new = str(new).strip()
+    if old is None or old == "":
+        return None if new in ("", "---") else new
+    if isinstance(old, (int, float)) and not isinstance(old, bool):
+        try:
+            number = float(new)
+        except ValueError:
+            return new
+        if number == old:
+            return None
+        return int(number) if number.is_integer() and isinstance(old, int) else number
+    return None if new == str(old).strip() else new
+
+
+def update_feature(feature_id, changes, locations):
+    """
+    Edit the rows of a feature in place.
+    changes maps column names (case-insensitive) to the submitted values;
+    locations is a list of (excel_path, sheet name) pairs, optionally with a
+    third {column: value} item restricting which rows are edited (rows with
+    no value in that column still match). Rows are found
+    through the feature index and only the cells whose value changes are
+    written, all in one transaction, so the cost does not grow with the
+    history. Returns the number of rows updated.
+    """
+    sync_journal()
+    feature_id = str(feature_id).strip()
+    changes = {str(col).strip().lower(): value for col, value in changes.items()}
+    targets = [
+        (_ensure_workbook(path), sheet_name, *(match or [{}]))
+        for path, sheet_name, *match in locations
+    ]
+
+    def apply(conn):
+        updated, touched = [], set()
+        for workbook, sheet_name, match in targets:
+            columns = _sheet_columns(conn, workbook, sheet_name)
+            edits = {columns[key]: value for key, value in changes.items() if key in columns}
+            if not edits:
+                continue
+            with span("workbook_write", file=workbook, sheet=sheet_name):
+                for row_id, data in conn.execute(
+                    """SELECT id, data FROM sheet_rows
+                       WHERE workbook = ? AND sheet = ? AND feature_id_key = ? AND deleted_at IS NULL""",
+                    (workbook, sheet_name, feature_id)
+                ).fetchall():
+                    data = json.loads(data)
+                    if any(data.get(col) not in (None, "", value) for col, value in match.items()):
+                        continue
+                    original = dict(data)
+                    changed = False
+                    for col, value in edits.items():
+                        new = _edited_cell(data.get(col), value)
+                        if new is not None:
+                            data[col] = new
+                            changed = True
+                    if changed:
+                        updated.append((json.dumps(data), *_feature_keys(data), row_id))
+                        touched.add(workbook)
+                        _update_aggregates(conn, workbook, sheet_name, added=[data], removed=[original])
+
+        conn.executemany(
+            "UPDATE sheet_rows SET data = ?, feature_id_key = ?, feature_name_key = ? WHERE id = ?",
+            updated
+        )
+        for workbook in touched:
+            _mark_changed(conn, workbook)
+        return len(updated)
+
+    count = run_write(apply)
+    if count:
+        schedule_export()
+    return count
+
+
+def delete_feature(feature_id, locations):
+    """
+    Soft-delete every row of a feature found in locations, a list of
+    (excel_path, sheet name) pairs. The rows are located through the feature
+    index and tombstoned in one transaction; only the workbooks that actually
+    held the feature are marked changed (and re-exported).
+    Returns the number of rows deleted.
+    """
+    sync_journal()
+    feature_id = str(feature_id).strip()
+    wanted = {(_ensure_workbook(path), sheet_name) for path, sheet_name in locations}
+
+    def tombstone(conn):
+        found = {}
+        for row_id, workbook, sheet_name, data in conn.execute(
+            "SELECT id, workbook, sheet, data FROM sheet_rows WHERE feature_id_key = ? AND deleted_at IS NULL",
+            (feature_id,)
+        ).fetchall():
+            if (workbook, sheet_name) in wanted:
+                found.setdefault((workbook, sheet_name), []).append((row_id, json.loads(data)))
+        deleted_at = datetime.now().isoformat(timespec="seconds")
+        for (workbook, sheet_name), rows in found.items():
+            with span("workbook_write", file=workbook, sheet=sheet_name):
+                _update_aggregates(conn, workbook, sheet_name, removed=[data for _, data in rows])
+                conn.executemany(
+                    "UPDATE sheet_rows SET deleted_at = ? WHERE id = ?",
+                    [(deleted_at, row_id) for row_id, _ in rows]
+                )
+        for workbook in {workbook for workbook, _ in found}:
+            _mark_changed(conn, workbook)
+        return sum(len(rows) for rows in found.values())
+
+    deleted = run_write(tombstone)
+    if deleted:
+        schedule_export()
+    return deleted
+
+
+def compact_store(older_than=None):
+    """
+    Physically remove soft-deleted rows (only those deleted before
+    older_than, a datetime, when given). Returns the number of rows removed.
+    """
+    if older_than is None:
+        sql, params = "DELETE FROM sheet_rows WHERE deleted_at IS NOT NULL", ()
     else:
+        sql, params = "DELETE FROM sheet_rows WHERE deleted_at < ?", (older_than.isoformat(timespec="seconds"),)
+    return run_write(lambda conn: conn.execute(sql, params).rowcount)
+
+
+# ================= AGGREGATES =================
+# Count, sum and an effort histogram per (metric, CA) and (metric, feature),
+# kept up to date inside the same transaction as every write to the main
+# workbook's Grooming / Implementation / Final sheets (the CA copies are not
+# counted again). Percentiles are read off the histogram: its buckets are
+# 5% wide and each reports the mean of its own efforts, so they are accurate
+# to about ±2.5%, and deletes can be subtracted exactly. Reading an aggregate
+# never scans the sheets.
+AGGREGATE_METRICS = {"Grooming": "grooming_effort", "Implementation": "implementation_effort", "Final": "final_effort"}
+AGGREGATE_PERCENTILES = (50, 75, 90, 95)
+_BUCKET_GROWTH = math.log(1.05)
+
+
+def _effort_bucket(value):
+    """Histogram bucket of an effort; efforts ≤ 0 share bucket "z"."""
+    return "z" if value <= 0 else str(math.floor(math.log(value) / _BUCKET_GROWTH))
+
+
+def _aggregate_entries(workbook, sheet_name, data):
+    """The (metric, scope, key, effort) entries one stored row contributes to."""
+    metric = AGGREGATE_METRICS.get(sheet_name)
+    if metric is None or workbook != workbook_key(EXCEL_PATH):
+        return []
+    fields = {str(col).strip().lower(): value for col, value in data.items()}
+    try:
+        effort = float(fields.get(metric))
+    except (TypeError, ValueError):
+        return []
+    if math.isnan(effort):
+        return []
+    ca_value = fields.get("ca")
+    ca_value = "" if ca_value is None else str(ca_value).strip()
+    return [(metric, "ca", ca_value, effort), (metric, "feature", _feature_keys(data)[0], effort)]
+
+
+def _update_aggregates(conn, workbook, sheet_name, added=(), removed=()):
+    """Add the rows in added and subtract the rows in removed (row dicts)."""
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for data in rows:
+            for metric, scope, key, effort in _aggregate_entries(workbook, sheet_name, data):
+                delta = deltas.setdefault((metric, scope, key), [0, 0.0, {}])
+                delta[0] += sign
+                delta[1] += sign * effort
+                bucket = _effort_bucket(effort)
+                n, bucket_total = delta[2].get(bucket, (0, 0.0))
+                delta[2][bucket] = (n + sign, bucket_total + sign * effort)
+
+    for (metric, scope, key), (count, total, histogram) in deltas.items():
+        current = conn.execute(
+            "SELECT count, total, histogram FROM effort_aggregates WHERE metric = ? AND scope = ? AND key = ?",
+            (metric, scope, key)
+        ).fetchone()
+        if current:
+            count += current[0]
+            total += current[1]
+            for bucket, (n, bucket_total) in json.loads(current[2]).items():
+                old_n, old_total = histogram.get(bucket, (0, 0.0))
+                histogram[bucket] = (old_n + n, old_total + bucket_total)
+        histogram = {bucket: value for bucket, value in histogram.items() if value[0] > 0}
+        if count <= 0:
+            conn.execute(
+                "DELETE FROM effort_aggregates WHERE metric = ? AND scope = ? AND key = ?", (metric, scope, key)
+            )
+        else:
+            conn.execute(
+                """INSERT OR REPLACE INTO effort_aggregates (metric, scope, key, count, total, histogram)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (metric, scope, key, count, total, json.dumps(histogram))
+            )
+
+
+def _rebuild_aggregates(conn):
+    """Recompute every aggregate from the stored rows (used by the migration)."""
+    conn.execute("DELETE FROM effort_aggregates")
+    workbook = workbook_key(EXCEL_PATH)
+    for sheet_name in AGGREGATE_METRICS:
+        rows = conn.execute(
+            "SELECT data FROM sheet_rows WHERE workbook = ? AND sheet = ? AND deleted_at IS NULL",
+            (workbook, sheet_name)
+        )
+        _update_aggregates(conn, workbook, sheet_name, added=[json.loads(data) for (data,) in rows])
+
+
+def _aggregate_summary(count, total, histogram):
+    summary = {"count": count, "sum": round(total, 2), "mean": round(total / count, 2) if count else None}
+    # (count, mean effort) per bucket, smallest efforts first
+    buckets = sorted(
+        ((n, bucket_total / n) for n, bucket_total in json.loads(histogram).values()),
+        key=lambda bucket: bucket[1]
+    )
+    for p in AGGREGATE_PERCENTILES:
+        rank, seen, value = p / 100 * count, 0, None
+        for n, mean in buckets:
+            seen += n
+            if seen >= rank:
+                value = round(mean, 2)
+                break
+        summary[f"p{p}"] = value
+    return summary
+
+
+def effort_aggregates(scope, key=None):
+    """
+    Return {key: {metric: {count, sum, mean, p50, ...}}} for scope "ca" or
+    "feature", optionally for a single key.
+    """
+    sync_journal()
+    sql = "SELECT metric, key, count, total, histogram FROM effort_aggregates WHERE scope = ?"
+    params = [scope]
+    if key is not None:
+        sql += " AND key = ?"
+        params.append(str(key).strip())
+    result = {}
+    for metric, row_key, count, total, histogram in get_db().execute(sql + " ORDER BY key", params):
+        result.setdefault(row_key, {})[metric] = _aggregate_summary(count, total, histogram)
+    return result
+
+
+# ================= EXCEL EXPORT =================
+_export_wakeup = threading.Event()
+_exporter_lock = threading.Lock()
+_exporter_thread = None
+
+
+def export_workbook(workbook, force=False):
+    """
+    Write the stored sheets of a workbook to its .xlsx file.
+    Skipped when the file is already up to date (unless force=True), e.g.
+    because another worker exported it first.
+    """
+    with workbook_file_lock(workbook):
+        _export_locked(workbook, force)
+
+
+def _export_locked(workbook, force):
+    path = workbook_path(workbook)
+
+    with db_transaction(immediate=False) as conn:
+        version, exported_version = conn.execute(
+            "SELECT version, exported_version FROM workbooks WHERE name = ?", (workbook,)
+        ).fetchone()
+        if exported_version >= version and not force and os.path.exists(path):
+            return
+        frames = {
+            sheet_name: _sheet_frame(conn, workbook, sheet_name)
+            for (sheet_name,) in conn.execute(
+                "SELECT sheet FROM sheets WHERE workbook = ? ORDER BY position", (workbook,)
+            ).fetchall()
+        }
+
+    if frames:
+        # Write next to the target and swap it in, so readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".xlsx")
+        os.close(fd)
+        os.chmod(tmp_path, os.stat(path).st_mode if os.path.exists(path) else 0o644)
+        try:
+            with span("xlsx_write", file=workbook), pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+                for sheet_name, df in frames.items():
+                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+            try:
+                os.replace(tmp_path, path)
+            except PermissionError:
+                raise PermissionError(
+                    f"Cannot save to '{path}'. The file is open in another program (e.g. Excel). "
+                    "Please close it and try again."
+                )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    run_write(lambda conn: conn.execute(
+        "UPDATE workbooks SET exported_version = ? WHERE name = ? AND exported_version < ?",
+        (version, workbook, version)
+    ))
+
+
+def export_pending_workbooks():
+    """Export every workbook that changed since its last export."""
+    pending = [
+        name for (name,) in get_db().execute(
+            "SELECT name FROM workbooks WHERE version > exported_version"
+        )
+    ]
+    for workbook in pending:
+        try:
+            export_workbook(workbook)
+        except Exception as e:
+            print(f"Warning: Could not export {workbook}: {e}")
+
+
+def _export_loop():
+    while True:
+        _export_wakeup.wait()
+        # Give bursts of writes a moment to settle so they share one export
+        time.sleep(EXPORT_INTERVAL)
+        _export_wakeup.clear()
+        export_pending_workbooks()
+
+
+def schedule_export():
+    """Ask the background exporter to refresh the .xlsx files soon."""
+    global _exporter_thread
+    with _exporter_lock:
+        if _exporter_thread is None:
+            _exporter_thread = threading.Thread(target=_export_loop, name="xlsx-exporter", daemon=True)
+            _exporter_thread.start()
+    _export_wakeup.set()
+
+
+atexit.register(export_pending_workbooks)
+
+
+# ================= WRITE-BEHIND JOURNAL =================
+# With EFFORT_WRITE_BEHIND=1, WriteBatch.commit only appends the batch to a
+# journal file (fsynced) and returns; the journal-flusher thread applies
+# the journaled batches to the store every EFFORT_WRITE_BEHIND_INTERVAL
+# seconds, many per transaction, and the exporter then refreshes the .xlsx
+# files as usual. Entries applied to the store are recorded with it, so a
+# crash between applying and clearing the journal never applies one twice;
+# whatever is left in the journal is applied by the next run (when it starts
+# serving, or on its first read or write).
+# Reads, edits and deletes apply the journal first, so they see every
+# write that already returned.
+WRITE_BEHIND = os.environ.get("EFFORT_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_INTERVAL = float(os.environ.get("EFFORT_WRITE_BEHIND_INTERVAL", "0.2"))
+JOURNAL_NAME = "effort_journal.jsonl"
+JOURNAL_PATH = os.path.join(DATA_DIR, JOURNAL_NAME)
+# The journal is moved here while it is applied, so new entries go to a fresh file
+JOURNAL_FLUSHING_PATH = JOURNAL_PATH + ".flushing"
+
+_journal_wakeup = threading.Event()
+_journal_lock = threading.Lock()
+_journal_thread = None
+
+
+def journal_append(groups):
+    """Durably record one batch: groups is [(workbook, sheet name, [row dicts])]."""
+    entry = {
+        "id": uuid.uuid4().hex,
+        "groups": [
+            [workbook, sheet_name, [{str(col): _to_cell(value) for col, value in row.items()} for row in rows]]
+            for workbook, sheet_name, rows in groups
+        ],
+    }
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    with workbook_file_lock(JOURNAL_NAME):
+        created = not os.path.exists(JOURNAL_PATH)
+        fd = os.open(JOURNAL_PATH, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
         try:
-            with pd.ExcelWriter(path, engine="openpyxl") as writer:
-                new_row_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        except PermissionError:
-            raise PermissionError(
-                f"Cannot save to '{path}'. The file is open in another program (e.g. Excel). "
-                "Please close it and try again."
+            if os.fstat(fd).st_size:
+                # A crash mid-append leaves a partial last line: end it, so it
+                # is skipped on its own instead of swallowing this entry
+                os.lseek(fd, -1, os.SEEK_END)
+                if os.read(fd, 1) != b"\n":
+                    line = b"\n" + line
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if created and hasattr(os, "O_DIRECTORY"):
+            # Make the new file's directory entry durable too
+            dir_fd = os.open(DATA_DIR, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    start_journal_flusher()
+    _journal_wakeup.set()
+
+
+def _journal_entries(path):
+    entries = []
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Only a write cut short by a crash can leave a partial line, and it never returned
+                print(f"Warning: Skipping unreadable journal line {number} in {path}")
+    return entries
+
+
+def flush_journal():
+    """Apply every journaled batch to the store. Returns the number of batches applied."""
+    with workbook_file_lock(JOURNAL_NAME + ".flush"):
+        if not os.path.exists(JOURNAL_FLUSHING_PATH):
+            with workbook_file_lock(JOURNAL_NAME):
+                if not os.path.exists(JOURNAL_PATH) or not os.path.getsize(JOURNAL_PATH):
+                    return 0
+                os.replace(JOURNAL_PATH, JOURNAL_FLUSHING_PATH)
+
+        entries = _journal_entries(JOURNAL_FLUSHING_PATH)
+        for entry in entries:
+            for workbook, _, _ in entry["groups"]:
+                _ensure_workbook(workbook_path(workbook))
+
+        def apply_entries(conn):
+            applied, touched = 0, set()
+            for entry in entries:
+                if conn.execute("SELECT 1 FROM journal_applied WHERE entry_id = ?", (entry["id"],)).fetchone():
+                    continue
+                for workbook, sheet_name, rows in entry["groups"]:
+                    with span("workbook_write", file=workbook, sheet=sheet_name):
+                        _append_rows(conn, workbook, sheet_name, rows)
+                    touched.add(workbook)
+                conn.execute("INSERT INTO journal_applied (entry_id) VALUES (?)", (entry["id"],))
+                applied += 1
+            for workbook in touched:
+                _mark_changed(conn, workbook)
+            return applied
+
+        applied = run_write(apply_entries)
+        os.remove(JOURNAL_FLUSHING_PATH)
+        run_write(lambda conn: conn.executemany(
+            "DELETE FROM journal_applied WHERE entry_id = ?", [(entry["id"],) for entry in entries]
+        ))
+    if applied:
+        schedule_export()
+    return applied
+
+
+def sync_journal():
+    """Apply the pending journal now (write-behind mode), so the caller sees every returned write."""
+    if WRITE_BEHIND and (os.path.exists(JOURNAL_FLUSHING_PATH) or
+                         (os.path.exists(JOURNAL_PATH) and os.path.getsize(JOURNAL_PATH))):
+        flush_journal()
+
+
+def _journal_loop():
+    while True:
+        _journal_wakeup.wait(WRITE_BEHIND_INTERVAL)
+        # Let a burst of requests land in the same transaction
+        time.sleep(WRITE_BEHIND_INTERVAL)
+        _journal_wakeup.clear()
+        try:
+            flush_journal()
+        except Exception as e:
+            print(f"Warning: Could not apply the write-behind journal: {e}")
+
+
+def start_journal_flusher():
+    """Start the journal-flusher thread (write-behind mode); it first applies what a previous run left."""
+    global _journal_thread
+    if not WRITE_BEHIND:
+        return
+    with _journal_lock:
+        if _journal_thread is None:
+            _journal_thread = threading.Thread(target=_journal_loop, name="journal-flusher", daemon=True)
+            _journal_thread.start()
+            _journal_wakeup.set()
+
+
+# Registered after the export hook, so it runs first at exit
+atexit.register(sync_journal)
+
+
+@app.cli.command("export-workbooks")
+def export_workbooks_command():
+    """Write every stored workbook to its .xlsx file now."""
+    sync_journal()
+    _ensure_workbook(EXCEL_PATH)
+    for safe_name in CA_FILE_MAP.values():
+        _ensure_workbook(os.path.join(DATA_DIR, f"CA_{safe_name}.xlsx"))
+    for (workbook,) in get_db().execute("SELECT name FROM workbooks").fetchall():
+        export_workbook(workbook, force=True)
+        print(f"Exported {workbook_path(workbook)}")
+
+
+@app.cli.command("check-inference")
+@click.option("--samples", default=500, help="Random feature vectors per model.")
+@click.option("--tolerance", default=1e-3, help="Largest allowed absolute difference.")
+def check_inference_command(samples, tolerance):
+    """Compare every inference backend with each model's own predict()."""
+    rng = np.random.default_rng(0)
+    failed = False
+    for path in model_file_paths():
+        model = model_registry.get(path).model
+        # Integer inputs like the forms send, plus a few missing values
+        matrix = rng.integers(0, 12, size=(samples, model.n_features_in_)).astype(float)
+        matrix[rng.random(matrix.shape) < 0.02] = np.nan
+        expected = model.predict(matrix)
+        for backend in INFERENCE_BACKENDS:
+            try:
+                diff = float(np.max(np.abs(compile_model(model, backend)(matrix) - expected)))
+            except Exception as e:
+                print(f"FAIL {os.path.basename(path)} [{backend}]: {e}")
+                failed = True
+                continue
+            status = "ok" if diff <= tolerance else "FAIL"
+            failed |= status == "FAIL"
+            print(f"{status:4} {os.path.basename(path)} [{backend}] max diff {diff:.2e}")
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command("compact-store")
+@click.option("--older-than-days", type=float, default=None,
+              help="Only purge rows deleted at least this many days ago.")
+def compact_store_command(older_than_days):
+    """Purge soft-deleted rows from the store and reclaim the space."""
+    older_than = None
+    if older_than_days is not None:
+        older_than = datetime.now() - timedelta(days=older_than_days)
+    removed = compact_store(older_than)
+    get_db().execute("VACUUM")
+    print(f"Removed {removed} deleted rows")
+
+# ================= STREAMING DOWNLOADS =================
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+_XML_ILLEGAL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+class _StreamBuffer:
+    """Write-only sink for zipfile; whatever was written is drained and sent after each chunk."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _xlsx_column(index):
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+def _xlsx_cell(ref, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if value != value or value in (float("inf"), float("-inf")):
+            return ""
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    text = xml_escape(_XML_ILLEGAL_CHARS.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def stream_xlsx(sheets):
+    """
+    Stream an .xlsx workbook as it is written.
+    sheets is a list of (sheet name, rows) where rows yields lists of cell
+    values, the first list being the header. Rows are compressed and sent in
+    chunks, so the first bytes go out right away and memory stays flat.
+    """
+    sheets = [(name[:31], rows) for name, rows in sheets]
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(sheets) + 1)
+            )
+            + '</Types>'
+        ))
+        zf.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ))
+        zf.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(
+                f'<sheet name="{xml_escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                for i, (name, _) in enumerate(sheets, 1)
+            )
+            + '</sheets></workbook>'
+        ))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+                for i in range(1, len(sheets) + 1)
             )
+            + '</Relationships>'
+        ))
+        yield buffer.drain()
+
+        for i, (_, rows) in enumerate(sheets, 1):
+            with zf.open(f"xl/worksheets/sheet{i}.xml", "w") as part:
+                part.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                )
+                for r, values in enumerate(rows, 1):
+                    cells = "".join(
+                        _xlsx_cell(f"{_xlsx_column(c)}{r}", value) for c, value in enumerate(values)
+                    )
+                    part.write(f'<row r="{r}">{cells}</row>'.encode("utf-8"))
+                    if r % 500 == 0:
+                        yield buffer.drain()
+                part.write(b"</sheetData></worksheet>")
+            yield buffer.drain()
+
+    yield buffer.drain()
+
+def stream_csv(header, rows):
+    """Stream CSV text: the header, then each row of values, a few hundred rows per chunk."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    for i, values in enumerate(rows, 1):
+        writer.writerow(["" if v is None else v for v in values])
+        if i % 500 == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+def download_response(chunks, filename, mimetype):
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers.set("Content-Disposition", "attachment", filename=filename)
+    return response
 
 # =========HELPER FUNCTION TO CLEAN AND NORMALIZE DATAFRAMES=========
 def get_column_name(df, target_name):
@@ -163,11 +2157,305 @@ def get_column_name(df, target_name):
             return col
     return None
 
+def normalize_feature_frame(df):
+    """
+    Strip column names, drop duplicate columns, blank out NaN and strip the
+    Feature_ID / Feature_Name values.
+    Returns (df, feature_id_col, feature_name_col); missing columns are None.
+    """
+    df.columns = df.columns.astype(str).str.strip()
+    df = df.loc[:, ~df.columns.duplicated()].fillna("")
+
+    fid_col = get_column_name(df, "feature_id")
+    fname_col = get_column_name(df, "feature_name")
+
+    if fid_col:
+        df[fid_col] = df[fid_col].astype(str).str.strip()
+    if fname_col:
+        df[fname_col] = df[fname_col].astype(str).str.strip()
+    return df, fid_col, fname_col
+
 def get_value_case_insensitive(record, target):
     for key in record.keys():
         if key.strip().lower() == target.lower():
             return record[key]
     return ""
+# ================= ESTIMATION =================
+# model_type → sheet the estimate is saved to, form field prefix and effort column
+ESTIMATION_TYPES = {
+    "grooming": {"sheet": "Grooming", "prefix": "G", "effort_col": "grooming_effort"},
+    "implementation": {"sheet": "Implementation", "prefix": "I", "effort_col": "implementation_effort"},
+}
+
+# The inputs of the grooming/implementation forms, posted as <prefix>_<name>:
+# (name, label, select options or None for a number input, tooltip)
+FORM_FIELDS = {
+    "grooming": [
+        ("UserStory_No", "User Story No", None,
+         "Identifies the specific user story for this grooming estimation."),
+        ("Story_Complexity", "Story Complexity", (1, 2, 3),
+         "Higher complexity requires deeper investigation and design discussions."),
+        ("Design_Complexity", "Design Complexity", (1, 2, 3),
+         "Complex design increases grooming discussions and architectural planning time."),
+        ("Meta_Complexity", "Meta Complexity", (1, 2, 3),
+         "META changes increase schema updates, ICFS impact analysis, and testing considerations."),
+        ("Assumptions_Count", "Assumptions Count", None,
+         "More assumptions increase uncertainty and discussion cycles."),
+        ("Features_Impacted", "Features Impacted", None,
+         "More impacted features increase integration and regression impact analysis."),
+        ("Codebase_Study_Required", "Codebase Study Required", (1,),
+         "If required, additional time is needed to understand existing implementation."),
+        ("No_of_Interfaces_Impacted", "Interfaces Impacted", None,
+         "More interfaces increase integration review and effort estimation complexity."),
+        ("Interface_Complexity", "Interface Complexity", (1, 2, 3),
+         "Complex interfaces increase design and validation discussions."),
+        ("Existing_Design_Study_Required", "Existing Design Study Required", (1,),
+         "Requires additional effort to analyze previous design documents."),
+        ("CrossComponent_Dependencies", "Cross Component Dependencies", None,
+         "More components involved increase coordination and integration discussions."),
+        ("ICFS_Design_Complexity", "ICFS Design Complexity", (1, 2, 3),
+         "ICFS updates increase documentation and grooming complexity."),
+        ("Cloud_Deployment", "Cloud Deployment", (1,),
+         "Cloud flow (TRSCONFIG → TEM → TAS → TPI) increases integration complexity."),
+        ("Classical_Deployment", "Classical Deployment", (1,),
+         "Classical flow (WEBEM → MCTRL → TEM → TAS → TPL) impacts effort differently."),
+        ("PM_impact", "PM Impact", (1,),
+         "Performance counter impact increases analysis and validation planning."),
+        ("CM_impact", "CM Impact", (1,),
+         "Configuration changes increase design and validation effort."),
+        ("FM_impact", "FM Impact", (1,),
+         "Alarm impact requires additional grooming discussions for flow handling."),
+        ("Fronthaul_impact", "Fronthaul Impact", (1, 2, 3),
+         "Higher FH impact increases RAN-side coordination complexity."),
+        ("Backhaul_impact", "Backhaul Impact", (1, 2, 3),
+         "BH impact affects transport design discussions and planning."),
+        ("Tech_Lead_Support", "Tech Lead Support", (1,),
+         "If needed, increases grooming cycles due to architectural guidance."),
+        ("Open_Points_Percentage", "Open Points Percentage", None,
+         "Represents uncertainty level and unresolved design discussions."),
+    ],
+    "implementation": [
+        ("UserStory_No", "User Story No", None,
+         "Identifies the specific user story for this implementation estimation."),
+        ("Story_Complexity", "Story Complexity", (1, 2, 3),
+         "Higher complexity increases coding and debugging time."),
+        ("Design_Complexity", "Design Complexity", (1, 2, 3),
+         "Complex design increases implementation difficulty."),
+        ("Meta_Complexity", "Meta Complexity", (1, 2, 3),
+         "META changes increase schema coding and regression testing effort."),
+        ("Features_Impacted", "Features Impacted", None,
+         "More impacted features increase integration and regression testing."),
+        ("Files_Impacted", "Files Impacted", None,
+         "More files increase coding, UT writing, and SCT effort."),
+        ("Approx_LOC_Source", "Approx LOC Source", None,
+         "Higher LOC increases development and debugging effort."),
+        ("Approx_LOC_Test", "Approx LOC Test", None,
+         "Test LOC adds UT and validation workload."),
+        ("Approx_Code_Complexity", "Approx Code Complexity", None,
+         "Higher complexity slows development and increases defect probability."),
+        ("No_of_Interfaces_Impacted", "No of Interfaces Impacted", None,
+         "Interface changes require integration and backward compatibility checks."),
+        ("Interface_Complexity", "Interface Complexity", (1, 2, 3),
+         "Complex APIs increase coding and testing effort."),
+        ("Interfaces_Added", "Interfaces Added", None,
+         "New interfaces require fresh coding and testing."),
+        ("Interfaces_Updated", "Interfaces Updated", None,
+         "Updated interfaces require regression validation."),
+        ("Interfaces_Deleted", "Interfaces Deleted", None,
+         "Deletion requires cleanup and regression verification."),
+        ("Integration_Complexity", "Integration Complexity", (1, 2, 3),
+         "Higher integration complexity increases SCT effort."),
+        ("CrossComponent_Dependencies", "Cross Component Dependencies", None,
+         "More dependencies increase coordination and testing effort."),
+        ("OAM_Simulator_Change", "OAM Simulator Change", (0, 1),
+         "Simulator updates add significant validation effort."),
+        ("UT_Count", "UT Count", None,
+         "More UT cases increase validation effort."),
+        ("PYSCT_Count", "PYSCT Count", None,
+         "PYSCT testing adds high system-level effort."),
+        ("New_Test_Cases", "New Test Cases", None,
+         "More test cases increase implementation and execution effort."),
+        ("Test_Case_Complexity", "Test Case Complexity", (1, 2, 3),
+         "Complex test cases require deeper validation time."),
+        ("Test_Coverage", "Test Coverage", None,
+         "Higher coverage increases UT and SCT workload."),
+        ("Legacy_Test_Coverage", "Legacy Test Coverage", None,
+         "Maintaining legacy coverage adds regression effort."),
+        ("ICFS_Design_Complexity", "ICFS Design Complexity", (1, 2, 3),
+         "ICFS changes increase design and coding effort."),
+        ("PM_impact", "PM Impact", (0, 1),
+         "Performance counter impact increases testing validation."),
+        ("CM_impact", "CM Impact", (0, 1),
+         "Configuration changes increase coding and testing workload."),
+        ("FM_impact", "FM Impact", (0, 1),
+         "Alarm flow changes increase coding and SCT effort."),
+        ("Tech_Lead_Support", "Tech Lead Support", (0, 1),
+         "If required, increases implementation cycles due to architectural clarification."),
+    ],
+}
+
+class FormSchema:
+    """
+    How one model's input vector is read from a story, compiled once per
+    feature list (see form_schema): which input name feeds each position,
+    which positions are fixed, and the column each value is stored under.
+    """
+
+    def __init__(self, features):
+        self.features = list(features)
+        self.defaults = np.zeros(len(self.features))
+        self.inputs = []  # (position, input name)
+        for position, f in enumerate(self.features):
+            if f == "META_Impact_Level":
+                # Removed from form — stays 0 for model compatibility
+                continue
+            # Form now uses UserStory_No instead of No_of_UserStories
+            self.inputs.append((position, "UserStory_No" if f == "No_of_UserStories" else f))
+
+    def map(self, get_value):
+        """
+        Build the model input for one user story.
+        get_value(name) returns the raw input for a feature.
+        Returns (values, input_data): the vector in model feature order, and the
+        feature columns to store with the estimate.
+        """
+        values = self.defaults.copy()
+        input_data = {}
+        for position, name in self.inputs:
+            values[position] = input_data[name] = safe(get_value(name))
+        return values, input_data
+
+    def read_form(self, form, prefix):
+        """
+        Parse a submitted form in one pass: fields are <prefix>_<name> and the
+        optional note on a field is <prefix>_<name>_note.
+        Returns (values, input_data, notes) with notes as [(field name, note)].
+        """
+        values = self.defaults.copy()
+        input_data = {}
+        notes = []
+        for position, name in self.inputs:
+            field_name = f"{prefix}_{name}"
+            values[position] = input_data[name] = safe(form.get(field_name, 0))
+            note = form.get(f"{field_name}_note", "").strip()
+            if note:
+                notes.append((field_name, clean_note(note)))
+        return values, input_data, notes
+
+
+_form_schemas = {}
+
+
+def form_schema(features):
+    """The FormSchema for a model's feature list, compiled on first use."""
+    key = tuple(features)
+    schema = _form_schemas.get(key)
+    if schema is None:
+        schema = _form_schemas[key] = FormSchema(key)
+    return schema
+
+
+# Model features the forms don't post: FormSchema fills them in
+DERIVED_FEATURES = {"META_Impact_Level", "No_of_UserStories"}
+
+def form_fields(model_type):
+    """Feature names the <model_type>.html form posts, as its <prefix>_<name> fields."""
+    return {name for name, _, _, _ in FORM_FIELDS[model_type]}
+
+
+def validate_model_features(path, model):
+    """
+    Reject a model whose features the grooming/implementation form cannot
+    provide. Features the current global model already uses without a form
+    field (they default to 0) are accepted too.
+    """
+    model_type = "grooming" if os.path.basename(path).startswith("grooming_") else "implementation"
+    features = list(getattr(model, "feature_names_in_", []))
+    if not features:
+        raise ValueError("model has no feature_names_in_")
+    known = form_fields(model_type) | DERIVED_FEATURES
+    known |= set(GROOMING_FEATURES if model_type == "grooming" else IMPLEMENTATION_FEATURES)
+    unknown = [f for f in features if f not in known]
+    if unknown:
+        raise ValueError(f"features not in the {model_type} form: {', '.join(unknown)}")
+
+
+model_registry.validate = validate_model_features
+
+def _predict_vectors(model_type, ca_value, model, vectors):
+    """
+    Predict one effort per input vector with a loaded model.
+    Only vectors not in the prediction cache are predicted, each once.
+    """
+    digest = model_registry.digest_of(model)
+    keys = [(ca_value, model_type, digest, tuple(values.tolist())) for values in vectors]
+    predictions = prediction_cache.get_many(keys) if digest else [None] * len(keys)
+    missing = list(dict.fromkeys(key for key, p in zip(keys, predictions) if p is None))
+    if missing:
+        matrix = np.array([key[3] for key in missing], dtype=float).reshape(len(missing), -1)
+        with span("predict", model=model_type):
+            computed = dict(zip(missing, (float(p) for p in get_predictor(model)(matrix))))
+        if digest:
+            prediction_cache.put_many(computed.items())
+        predictions = [computed[key] if p is None else p for key, p in zip(keys, predictions)]
+    return [round(p, 2) for p in predictions]
+
+def predict_efforts(model_type, stories):
+    """
+    Estimate many user stories at once.
+    stories is a list of (ca_value, get_value) pairs. Stories are grouped by CA
+    and each CA model runs a single vectorized predict over its group.
+    Returns [(effort, input_data, is_ca_specific), ...] in input order.
+    """
+    groups = {}
+    for i, (ca_value, _) in enumerate(stories):
+        groups.setdefault(ca_value, []).append(i)
+
+    results = [None] * len(stories)
+    for ca_value, indexes in groups.items():
+        model, features, is_ca_specific = load_ca_model(ca_value, model_type)
+        schema = form_schema(features)
+        with span("feature_vector", model=model_type):
+            mapped = [schema.map(stories[i][1]) for i in indexes]
+        efforts = _predict_vectors(model_type, ca_value, model, [values for values, _ in mapped])
+        for i, (_, input_data), effort in zip(indexes, mapped, efforts):
+            results[i] = (effort, input_data, is_ca_specific)
+    return results
+
+def estimate_form(model_type, ca_value, form):
+    """
+    Estimate one story submitted through the grooming/implementation form.
+    The form is read with the schema of the model that makes the estimate
+    (CA-specific or global), so the notes follow that model's fields.
+    Returns (effort, input_data, notes).
+    """
+    model, features, _ = load_ca_model(ca_value, model_type)
+    with span("feature_vector", model=model_type):
+        values, input_data, notes = form_schema(features).read_form(form, ESTIMATION_TYPES[model_type]["prefix"])
+    [effort] = _predict_vectors(model_type, ca_value, model, [values])
+    return effort, input_data, notes
+
+def estimation_row(model_type, feature_id, feature_name, user_story_name, ca_value, effort, input_data):
+    row = {
+        "Feature_ID": feature_id,
+        "Feature_Name": feature_name,
+        "User_Story_Name": user_story_name,
+        "CA": ca_value,
+        ESTIMATION_TYPES[model_type]["effort_col"]: effort
+    }
+    row.update(input_data)
+    return row
+
+def add_estimation_rows(batch, model_type, row):
+    """Queue an estimate for the main sheet, the CA file and the CA sheet."""
+    sheet = ESTIMATION_TYPES[model_type]["sheet"]
+    batch.add(sheet, row)
+    # Save to CA-specific Excel file (only when CA is a known valid value)
+    ca_excel = get_ca_excel_path(row["CA"])
+    if ca_excel:
+        batch.add(sheet, row, excel_path=ca_excel)
+        batch.add(row["CA"], {**row, "record_type": sheet})
+
 # ================= ROUTES =================
 
 @app.route("/")
@@ -185,72 +2473,30 @@ def grooming():
         Feature_Name = request.form.get("Feature_Name", "").strip()
         ca_value = request.form.get("CA", "").strip()
 
-        # Load CA-specific model if available, else fall back to global
-        g_model, g_features, _ = load_ca_model(ca_value, "grooming")
+        # Uses the CA-specific model if available, else falls back to global
+        effort, input_data, notes = estimate_form("grooming", ca_value, request.form)
 
-        values = []
-        input_data = {}
+        row = estimation_row(
+            "grooming", Feature_ID, Feature_Name, User_Story_Name, ca_value, effort, input_data
+        )
 
-        for f in g_features:
-            if f == "META_Impact_Level":
-                # Removed from form — default to 0 for model compatibility
-                val = 0.0
-            elif f == "No_of_UserStories":
-                # Form now uses UserStory_No instead
-                val = safe(request.form.get("G_UserStory_No", 0))
-            else:
-                val = safe(request.form.get(f"G_{f}", 0))
-            values.append(val)
-            # Save under new column name; skip removed columns
-            if f == "No_of_UserStories":
-                input_data["UserStory_No"] = val
-            elif f != "META_Impact_Level":
-                input_data[f] = val
-
-        effort = round(float(
-            g_model.predict(np.array(values).reshape(1, -1))[0]
-        ), 2)
-
-        row = {
-            "Feature_ID": Feature_ID,
-            "Feature_Name": Feature_Name,
-            "User_Story_Name": User_Story_Name,
-            "CA": ca_value,
-            "grooming_effort": effort
-        }
-
-        row.update(input_data)
-        save_to_sheet("Grooming", row)
-        # Save to CA-specific Excel file (only when CA is a known valid value)
-        ca_excel = get_ca_excel_path(ca_value)
-        if ca_excel:
-            save_to_sheet("Grooming", row, excel_path=ca_excel)
-            save_to_sheet(ca_value, {**row, "record_type": "Grooming"})
+        # All rows of this request (main, CA file, CA sheet, notes) are committed together
+        batch = WriteBatch()
+        add_estimation_rows(batch, "grooming", row)
 
         # -------- SAVE GROOMING NOTES --------
-        notes_rows = []
-
-        for f in GROOMING_FEATURES:
-            field_name = f"G_{f}"
-            note_value = request.form.get(f"{field_name}_note", "").strip()
-
-            if note_value:
-                notes_rows.append({
-                    "Feature_ID": Feature_ID,
-                    "Sheet": "Grooming",
-                    "Field_Name": field_name,
-                    "Note": clean_note(note_value),
-                    "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-        for note_row in notes_rows:
-            save_to_sheet("Notes", note_row)
+        saved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        batch.extend("Notes", [
+            {"Feature_ID": Feature_ID, "Sheet": "Grooming", "Field_Name": field_name, "Note": note, "Time": saved_at}
+            for field_name, note in notes
+        ])
+        batch.commit()
 
         session["modal_result"] = effort
         return redirect("/grooming")
 
     effort = session.pop("modal_result", None)
-    return render_template("grooming.html", effort=effort)
+    return render_template("grooming.html", effort=effort, fields=FORM_FIELDS["grooming"], prefix="G")
 
 # ================= IMPLEMENTATION =================
 @app.route("/implementation", methods=["GET", "POST"])
@@ -262,69 +2508,32 @@ def implementation():
         Feature_Name = request.form.get("Feature_Name", "").strip()
         ca_value = request.form.get("CA", "").strip()
 
-        # Load CA-specific model if available, else fall back to global
-        i_model, i_features, _ = load_ca_model(ca_value, "implementation")
+        # Uses the CA-specific model if available, else falls back to global
+        effort, input_data, notes = estimate_form("implementation", ca_value, request.form)
 
-        values = []
-        input_data = {}
-
-        for f in i_features:
-            if f == "No_of_UserStories":
-                # Form now uses UserStory_No instead
-                val = safe(request.form.get("I_UserStory_No", 0))
-            else:
-                val = safe(request.form.get(f"I_{f}", 0))
-            values.append(val)
-            # Save under new column name
-            if f == "No_of_UserStories":
-                input_data["UserStory_No"] = val
-            else:
-                input_data[f] = val
-
-        effort = round(float(
-            i_model.predict(np.array(values).reshape(1, -1))[0]
-        ), 2)
-
-        row = {
-            "Feature_ID": Feature_ID,
-            "Feature_Name": Feature_Name,
-            "User_Story_Name": User_Story_Name,
-            "CA": ca_value,
-            "implementation_effort": effort
-        }
+        row = estimation_row(
+            "implementation", Feature_ID, Feature_Name, User_Story_Name, ca_value, effort, input_data
+        )
 
-        row.update(input_data)
-        save_to_sheet("Implementation", row)
-        # Save to CA-specific Excel file (only when CA is a known valid value)
-        ca_excel = get_ca_excel_path(ca_value)
-        if ca_excel:
-            save_to_sheet("Implementation", row, excel_path=ca_excel)
-            save_to_sheet(ca_value, {**row, "record_type": "Implementation"})
+        # All rows of this request (main, CA file, CA sheet, notes) are committed together
+        batch = WriteBatch()
+        add_estimation_rows(batch, "implementation", row)
 
         # -------- SAVE IMPLEMENTATION NOTES --------
-        notes_rows = []
-
-        for f in IMPLEMENTATION_FEATURES:
-            field_name = f"I_{f}"
-            note_value = request.form.get(f"{field_name}_note", "").strip()
-
-            if note_value:
-                notes_rows.append({
-                    "Feature_ID": Feature_ID,
-                    "Sheet": "Implementation",
-                    "Field_Name": field_name,
-                    "Note": clean_note(note_value),
-                    "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-
-        for note_row in notes_rows:
-            save_to_sheet("Notes", note_row)
+        saved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        batch.extend("Notes", [
+            {"Feature_ID": Feature_ID, "Sheet": "Implementation", "Field_Name": field_name, "Note": note, "Time": saved_at}
+            for field_name, note in notes
+        ])
+        batch.commit()
 
         session["modal_result"] = effort
         return redirect("/implementation")
 
     modal_result = session.pop("modal_result", None)
-    return render_template("implementation.html", effort=modal_result)
+    return render_template(
+        "implementation.html", effort=modal_result, fields=FORM_FIELDS["implementation"], prefix="I"
+    )
 
 # ================= FINAL =================
 @app.route("/final", methods=["GET", "POST"])
@@ -342,59 +2551,25 @@ def final():
         query = request.form.get("feature_id", "").strip()
         action = request.form.get("action")
 
-        if query and os.path.exists(EXCEL_PATH):
-            with pd.ExcelFile(EXCEL_PATH) as xls:
-
-                # ---------- GROOMING ----------
-                if "Grooming" in xls.sheet_names:
-                    g_df = pd.read_excel(EXCEL_PATH, sheet_name="Grooming")
-                    if not g_df.empty:
-
-                        g_df = g_df.loc[:, ~g_df.columns.duplicated()]
-                        g_df = g_df.fillna("")
-
-                        fid_col = get_column_name(g_df, "feature_id")
-                        fname_col = get_column_name(g_df, "feature_name")
-
-                        if fid_col:
-                            g_df[fid_col] = g_df[fid_col].apply(lambda x: str(x).strip())
-                        if fname_col:
-                            g_df[fname_col] = g_df[fname_col].apply(lambda x: str(x).strip())
-
-                        if fid_col and fname_col:
-                            match = g_df[
-                                (g_df[fid_col] == query) |
-                                (g_df[fname_col].str.lower() == query.lower())
-                            ]
-
-                            if not match.empty:
-                                grooming_record = match.iloc[0].to_dict()
-                                feature_id = grooming_record.get(fid_col, "")
-
-                # ---------- IMPLEMENTATION ----------
-                if "Implementation" in xls.sheet_names:
-                    i_df = pd.read_excel(EXCEL_PATH, sheet_name="Implementation")
-                    if not i_df.empty:
-
-                        i_df = i_df.loc[:, ~i_df.columns.duplicated()]
-                        i_df = i_df.fillna("")
-
-                        fid_col = get_column_name(i_df, "feature_id")
-                        fname_col = get_column_name(i_df, "feature_name")
-
-                        if fid_col:
-                            i_df[fid_col] = i_df[fid_col].apply(lambda x: str(x).strip())
-                        if fname_col:
-                            i_df[fname_col] = i_df[fname_col].apply(lambda x: str(x).strip())
-
-                        if fid_col and fname_col:
-                            match = i_df[
-                                (i_df[fid_col] == feature_id) |
-                                (i_df[fname_col].str.lower() == query.lower())
-                            ]
-
-                            if not match.empty:
-                                implementation_record = match.iloc[0].to_dict()
+        if query and workbook_exists():
+            xls_sheets = sheet_names()
+
+            # ---------- GROOMING ----------
+            if "Grooming" in xls_sheets:
+                match, fid_col, fname_col = normalize_feature_frame(
+                    find_feature_rows("Grooming", feature_id=query, feature_name=query)
+                )
+                if fid_col and fname_col and not match.empty:
+                    grooming_record = match.iloc[0].to_dict()
+                    feature_id = grooming_record.get(fid_col, "")
+
+            # ---------- IMPLEMENTATION ----------
+            if "Implementation" in xls_sheets:
+                match, fid_col, fname_col = normalize_feature_frame(
+                    find_feature_rows("Implementation", feature_id=feature_id or None, feature_name=query)
+                )
+                if fid_col and fname_col and not match.empty:
+                    implementation_record = match.iloc[0].to_dict()
 
         # ---------- CALCULATE ----------
         if action == "calculate" and grooming_record and implementation_record:
@@ -406,6 +2581,7 @@ def final():
             row = {
                 "feature_id": feature_id,
                 "feature_name": get_value_case_insensitive(grooming_record, "feature_name"),
+                "ca": get_value_case_insensitive(grooming_record, "ca"),
                 "grooming_effort": g_effort,
                 "implementation_effort": i_effort,
                 "final_effort": final_effort,
@@ -429,58 +2605,220 @@ def final():
     )
 
 
+# ================= BULK FINAL =================
+def _latest_efforts(sheet_name, *effort_cols):
+    """
+    Newest row per Feature_ID of a sheet as a DataFrame indexed by the
+    normalized Feature_ID, with the Feature_Name / CA / effort columns.
+    """
+    columns = ["feature_name", "ca", *effort_cols]
+    if sheet_name not in sheet_names():
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="feature_id"))
+
+    df, fid_col, fname_col = normalize_feature_frame(read_sheet(sheet_name))
+    ca_col = get_column_name(df, "ca")
+    if not fid_col:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="feature_id"))
+
+    latest = pd.DataFrame({
+        "feature_id": df[fid_col],
+        "feature_name": df[fname_col] if fname_col else "",
+        "ca": df[ca_col].astype(str).str.strip() if ca_col else "",
+    })
+    for effort_col in effort_cols:
+        value_col = get_column_name(df, effort_col)
+        # Unreadable efforts count as 0, like safe()
+        latest[effort_col] = pd.to_numeric(df[value_col], errors="coerce").fillna(0.0).round(2) if value_col else 0.0
+    # read_sheet is newest first, so the first row per feature is the current one
+    latest = latest[latest["feature_id"] != ""].drop_duplicates("feature_id", keep="first")
+    return latest.set_index("feature_id")
+
+
+def compute_final_efforts(only_changed=False, dry_run=False):
+    """
+    Compute the final effort (grooming + implementation) of every feature that
+    has both estimates, with one merge of the two sheets on the normalized
+    Feature_ID, and append the results to "Final" in a single write.
+    only_changed skips features whose latest Final row already has the same
+    efforts. Returns a summary dict.
+    """
+    grooming = _latest_efforts("Grooming", "grooming_effort")
+    implementation = _latest_efforts("Implementation", "implementation_effort")
+    merged = grooming.join(implementation[["implementation_effort"]], how="inner")
+    merged["final_effort"] = (merged["grooming_effort"] + merged["implementation_effort"]).round(2)
+
+    candidates = len(merged)
+    if only_changed and len(merged):
+        previous = _latest_efforts("Final", "grooming_effort", "implementation_effort").reindex(merged.index)
+        same = (
+            (merged["grooming_effort"] == previous["grooming_effort"])
+            & (merged["implementation_effort"] == previous["implementation_effort"])
+        )
+        merged = merged[~same]
+
+    if len(merged) and not dry_run:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            {
+                "feature_id": feature_id,
+                "feature_name": row.feature_name,
+                "ca": row.ca,
+                "grooming_effort": row.grooming_effort,
+                "implementation_effort": row.implementation_effort,
+                "final_effort": row.final_effort,
+                "time": now,
+            }
+            for feature_id, row in zip(merged.index, merged.itertuples(index=False))
+        ]
+        with WriteBatch() as batch:
+            # Oldest first so the list reads the same way as the sheet
+            batch.extend("Final", reversed(rows))
+
+    return {
+        "features": candidates,
+        "written": 0 if dry_run else len(merged),
+        "skipped": candidates - len(merged),
+        "dry_run": dry_run,
+    }
+
+
+@app.route("/api/v1/final/bulk", methods=["POST"])
+def api_final_bulk():
+    """Compute final efforts for all features (?only_changed=1, ?dry_run=1)."""
+    if not workbook_exists():
+        return jsonify(error="Excel file not found"), 404
+    return jsonify(compute_final_efforts(
+        only_changed=request.args.get("only_changed") == "1",
+        dry_run=request.args.get("dry_run") == "1",
+    ))
+
+
+@app.cli.command("final-bulk")
+@click.option("--only-changed", is_flag=True, help="Skip features whose Final row is already up to date.")
+@click.option("--dry-run", is_flag=True, help="Only report what would be written.")
+def final_bulk_command(only_changed, dry_run):
+    """Compute and save the final effort of every feature."""
+    summary = compute_final_efforts(only_changed=only_changed, dry_run=dry_run)
+    verb = "Would write" if dry_run else "Wrote"
+    print(f"{verb} {summary['features'] - summary['skipped']} Final rows "
+          f"({summary['skipped']} of {summary['features']} features unchanged)")
+
+
 # ================= HISTORY HOME =================
 @app.route("/history")
 def history_home():
     return render_template("history_home.html")
 
 
-# ================= GROOMING HISTORY =================
-@app.route("/history/grooming")
-def grooming_history():
+# ================= HISTORY TABLES =================
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
 
-    if not os.path.exists(EXCEL_PATH):
-        return render_template("history_table.html", title="Grooming History", rows=[])
+def render_history(title, sheets, excel_path=None, record_type=False, download_url=None):
+    """
+    Render one page of history rows (server-side pagination, sorting and filtering).
 
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name="Grooming")
-        rows = [filter_record(r) for r in df.to_dict(orient="records")]
-    except:
-        rows = []
+    Query parameters: page, page_size, sort=<column>, order=asc|desc,
+    filter_<column>=<text>; format=json returns the page as JSON instead of HTML.
+    record_type=True adds a record_type column holding each row's sheet name.
+    """
+    page = max(request.args.get("page", 1, type=int), 1)
+    page_size = min(max(request.args.get("page_size", HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+
+    columns = []
+    if workbook_exists(excel_path):
+        layout = workbook_layout(excel_path)
+        for sheet in sheets:
+            for col in layout.get(sheet, []):
+                if col not in columns and col.strip().lower() not in EXCLUDED_DISPLAY_COLS:
+                    columns.append(col)
+    if record_type and "record_type" not in columns:
+        columns.append("record_type")
+    stored_columns = [c for c in columns if not (record_type and c == "record_type")]
+
+    sort = request.args.get("sort", "")
+    sort = sort if sort in stored_columns else None
+    descending = request.args.get("order", "desc").lower() != "asc"
+    filters = {
+        key[len("filter_"):]: value
+        for key, value in request.args.items()
+        if key.startswith("filter_") and key[len("filter_"):] in stored_columns and value.strip()
+    }
+
+    rows, total = query_rows(
+        sheets, excel_path,
+        offset=(page - 1) * page_size, limit=page_size,
+        sort=sort, descending=descending, filters=filters
+    )
+    table = []
+    for sheet, data in rows:
+        if record_type:
+            data["record_type"] = sheet
+        table.append({col: "" if data.get(col) is None else data.get(col) for col in columns})
+
+    pages = max((total + page_size - 1) // page_size, 1)
+
+    if request.args.get("format") == "json":
+        return jsonify(
+            title=title, columns=columns, rows=table,
+            page=page, page_size=page_size, pages=pages, total=total,
+            sort=sort, order="desc" if descending else "asc", filters=filters
+        )
+
+    def page_url(**changes):
+        args = request.args.to_dict()
+        args.update({k: v for k, v in changes.items() if v is not None})
+        args.pop("format", None)
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
 
-    return render_template("history_table.html", title="Grooming History", rows=rows)
+    return render_template(
+        "history_table.html",
+        title=title, columns=columns, rows=table,
+        page=page, page_size=page_size, pages=pages, total=total,
+        sort=sort, order="desc" if descending else "asc", filters=filters,
+        sortable_columns=stored_columns, page_url=page_url,
+        download_url=download_url if total else None
+    )
 
 
-# ================= IMPLEMENTATION HISTORY =================
-@app.route("/history/implementation")
-def implementation_history():
+# ================= DASHBOARD =================
+@app.route("/dashboard")
+def dashboard():
+    feature_id = request.args.get("feature_id", "").strip()
+    return render_template(
+        "dashboard.html",
+        metrics=list(AGGREGATE_METRICS.values()),
+        columns=["count", "mean", "p50", "p90", "p95"],
+        by_ca=effort_aggregates("ca"),
+        feature_id=feature_id,
+        feature_stats=effort_aggregates("feature", feature_id).get(feature_id) if feature_id else None,
+    )
 
-    if not os.path.exists(EXCEL_PATH):
-        return render_template("history_table.html", title="Implementation History", rows=[])
 
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name="Implementation")
-        rows = [filter_record(r) for r in df.to_dict(orient="records")]
-    except:
-        rows = []
+@app.route("/api/v1/aggregates/<scope>")
+def api_aggregates(scope):
+    """Precomputed effort aggregates by "ca" or "feature" (?key= for a single one)."""
+    if scope not in ("ca", "feature"):
+        return jsonify(error=f"Unknown scope '{scope}'"), 404
+    return jsonify(scope=scope, aggregates=effort_aggregates(scope, request.args.get("key")))
 
-    return render_template("history_table.html", title="Implementation History", rows=rows)
 
+# ================= GROOMING HISTORY =================
+@app.route("/history/grooming")
+def grooming_history():
+    return render_history("Grooming History", ["Grooming"])
 
-# ================= FINAL HISTORY =================
-@app.route("/history/final")
-def final_history():
 
-    if not os.path.exists(EXCEL_PATH):
-        return render_template("history_table.html", title="Final History", rows=[])
+# ================= IMPLEMENTATION HISTORY =================
+@app.route("/history/implementation")
+def implementation_history():
+    return render_history("Implementation History", ["Implementation"])
 
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name="Final")
-        rows = [filter_record(r) for r in df.to_dict(orient="records")]
-    except:
-        rows = []
 
-    return render_template("history_table.html", title="Final History", rows=rows)
+# ================= FINAL HISTORY =================
+@app.route("/history/final")
+def final_history():
+    return render_history("Final History", ["Final"])
 
 
 
@@ -497,7 +2835,7 @@ def search():
 
         query = request.form.get("query", "").strip()
 
-        if query == "" or not os.path.exists(EXCEL_PATH):
+        if query == "" or not workbook_exists():
             return render_template(
                 "search.html",
                 grooming_results=[],
@@ -505,12 +2843,29 @@ def search():
                 final_results=[]
             )
 
-        xls = pd.ExcelFile(EXCEL_PATH)
+        xls_sheets = sheet_names()
+        query_clean = str(query).strip()
+
+        # ❌ Skip Notes sheet and CA-specific sheets (to avoid duplicate results)
+        search_sheets = [s for s in xls_sheets
+                         if s.strip().lower() != "notes" and s.strip() not in CA_SHEETS]
+
+        # ✅ Load matching rows of every sheet plus their notes in ONE pass
+        snapshot = load_feature_snapshot(search_sheets, query_clean, notes_sheet="Notes")
+
+        matches = {}
+        for sheet in search_sheets:
+
+            filtered, feature_id_col, _ = normalize_feature_frame(snapshot[sheet])
+
+            if not feature_id_col or filtered.empty:
+                continue
+
+            matches[sheet] = (filtered, feature_id_col)
 
-        # ✅ Load Notes sheet ONCE
         notes_df = None
-        if "Notes" in xls.sheet_names:
-            notes_df = pd.read_excel(EXCEL_PATH, sheet_name="Notes")
+        if "Notes" in snapshot and matches:
+            notes_df = snapshot["Notes"]
             notes_df = notes_df.fillna("")
             # Normalize column names
             notes_df.columns = notes_df.columns.astype(str).str.strip()
@@ -532,82 +2887,54 @@ def search():
                     note_col_notes = col
 
             # If required columns missing → skip notes safely
-            if not feature_id_col_notes or not sheet_col_notes:
+            if not all([feature_id_col_notes, sheet_col_notes, field_col_notes, note_col_notes]):
                 notes_df = None
             else:
                 notes_df[feature_id_col_notes] = notes_df[feature_id_col_notes].astype(str).str.strip()
                 notes_df[sheet_col_notes] = notes_df[sheet_col_notes].astype(str).str.strip()
-        for sheet in xls.sheet_names:
-
-            # ❌ Skip Notes sheet and CA-specific sheets (to avoid duplicate results)
-            if sheet.strip().lower() == "notes" or sheet.strip() in CA_SHEETS:
-                continue
-
-            df = pd.read_excel(EXCEL_PATH, sheet_name=sheet)
-
-            if df.empty:
-                continue
-
-            df.columns = df.columns.astype(str).str.strip()
-            df = df.loc[:, ~df.columns.duplicated()]
-            df = df.fillna("")
-
-            feature_id_col = None
-            feature_name_col = None
 
-            for col in df.columns:
-                if col.strip().lower() == "feature_id":
-                    feature_id_col = col
-                if col.strip().lower() == "feature_name":
-                    feature_name_col = col
-
-            if not feature_id_col:
-                continue
-
-            df[feature_id_col] = df[feature_id_col].astype(str).str.strip()
-
-            if feature_name_col:
-                df[feature_name_col] = df[feature_name_col].astype(str).str.strip()
-            else:
-                df["feature_name"] = ""
-                feature_name_col = "feature_name"
-
-            query_clean = str(query).strip()
-
-            filtered = df[
-                (df[feature_id_col] == query_clean) |
-                (df[feature_name_col].str.lower() == query_clean.lower())
-            ]
-
-            if filtered.empty:
-                continue
-
-            records = filtered.to_dict(orient="records")
-
-            # ✅ Attach notes properly
-            if notes_df is not None:
-                for record in records:
-
-                    fid = str(record.get(feature_id_col, "")).strip()
-                    sheet_name_clean = sheet.strip()
-
-                    field_notes = notes_df[
-                        (notes_df[feature_id_col_notes] == fid) &
-                        (notes_df[sheet_col_notes] == sheet_name_clean)
-                    ]
-
-                    for _, note_row in field_notes.iterrows():
-                        field = note_row[field_col_notes]
-                        note = note_row[note_col_notes]
-
-                        record[f"{field}_NOTE"] = note
+        # ✅ Pivot notes ONCE: one row per (Feature_ID, Sheet), one "<field>_NOTE" column per field.
+        # When a field has several notes the last one listed wins, as before.
+        notes_wide = None
+        if notes_df is not None and not notes_df.empty:
+            notes_df = notes_df.assign(_note_col=notes_df[field_col_notes].astype(str) + "_NOTE")
+            notes_wide = (
+                notes_df
+                .drop_duplicates([feature_id_col_notes, sheet_col_notes, "_note_col"], keep="last")
+                .pivot(index=[feature_id_col_notes, sheet_col_notes], columns="_note_col", values=note_col_notes)
+            )
 
-            # Remove excluded columns and clean empty values
-            records = [filter_record(r) for r in records]
+        for sheet, (filtered, feature_id_col) in matches.items():
+
+            # Remove excluded columns
+            display_cols = [c for c in filtered.columns
+                            if c.strip().lower() not in EXCLUDED_DISPLAY_COLS]
+            results = filtered[display_cols].reset_index(drop=True)
+
+            # ✅ Attach notes with a single join on (Feature_ID, Sheet)
+            notes_part = None
+            if notes_wide is not None:
+                notes_part = (
+                    results[[feature_id_col]]
+                    .assign(_sheet=sheet.strip())
+                    .join(notes_wide, on=[feature_id_col, "_sheet"])
+                    .drop(columns=[feature_id_col, "_sheet"])
+                )
+
+            # Clean empty values, only in the columns that can hold one
+            # (integer and boolean columns never do)
+            records = results.to_dict(orient="records")
+            blank_cols = [col for col, dtype in results.dtypes.items() if dtype.kind not in "iub"]
             for record in records:
-                for k, v in record.items():
-                    if v == "" or str(v).lower() == "nan":
-                        record[k] = "---"
+                for col in blank_cols:
+                    value = record[col]
+                    if value == "" or str(value).lower() == "nan":
+                        record[col] = "---"
+
+            # Only the notes a record actually has are added
+            if notes_part is not None:
+                for (pos, note_key), note in notes_part.stack().dropna().items():
+                    records[pos][note_key] = "---" if note == "" or str(note).lower() == "nan" else note
 
             sheet_name = sheet.strip().lower()
 
@@ -631,42 +2958,37 @@ def edit(sheet, feature_id):
 
     next_page = request.args.get("next", "search")  # 👈 capture source
 
-    if not os.path.exists(EXCEL_PATH):
+    if not workbook_exists():
         return "Excel file not found"
 
-    df = pd.read_excel(EXCEL_PATH, sheet_name=sheet)
-
-    if df.empty:
-        return "Sheet is empty"
+    feature_id = str(feature_id).strip()
 
-    df.columns = df.columns.str.strip()
+    # Indexed lookup — only the matching rows are read
+    record = find_feature_rows(sheet, feature_id=feature_id)
+    record.columns = record.columns.str.strip()
 
     # Find feature_id column irrespective of case
-    feature_id_col = None
-    for col in df.columns:
-        if col.strip().lower() == "feature_id":
-            feature_id_col = col
-            break
+    feature_id_col = get_column_name(record, "feature_id")
 
     if not feature_id_col:
         return "feature_id column missing"
 
-    df[feature_id_col] = df[feature_id_col].fillna("").astype(str).str.strip()
-    feature_id = str(feature_id).strip()
-
-    record = df[df[feature_id_col] == feature_id]
-
     if record.empty:
         return "Record not found"
 
     if request.method == "POST":
 
-        for col in df.columns:
-            if col in request.form:
-                df.loc[df[feature_id_col] == feature_id, col] = request.form[col]
+        # ✅ Update the sheet's rows plus their copies in the CA file and CA sheet
+        locations = [(EXCEL_PATH, sheet)]
+        for ca_value in {str(get_value_case_insensitive(r, "CA") or "").strip()
+                         for r in record.to_dict(orient="records")}:
+            ca_excel = get_ca_excel_path(ca_value)
+            if ca_excel and sheet in ("Grooming", "Implementation"):
+                locations.append((ca_excel, sheet))
+            if ca_value in CA_SHEETS:
+                locations.append((EXCEL_PATH, ca_value, {"record_type": sheet}))
 
-        with pd.ExcelWriter(EXCEL_PATH, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            df.to_excel(writer, sheet_name=sheet, index=False)
+        update_feature(feature_id, request.form.to_dict(), locations)
 
         # 👇 Redirect back properly
         if next_page == "final":
@@ -682,66 +3004,55 @@ def edit(sheet, feature_id):
 @app.route("/search/download")
 def download_search():
     query = request.args.get("query", "").strip()
-    if not query or not os.path.exists(EXCEL_PATH):
+    if not query or not workbook_exists():
         return redirect("/search")
 
     sheets_data = {}
     try:
-        xls = pd.ExcelFile(EXCEL_PATH)
-        search_sheets = [s for s in xls.sheet_names
+        search_sheets = [s for s in sheet_names()
                          if s.strip().lower() != "notes" and s.strip() not in CA_SHEETS]
+        q = str(query).strip()
+        snapshot = load_feature_snapshot(search_sheets, q)
         for sheet in search_sheets:
-            try:
-                df = pd.read_excel(EXCEL_PATH, sheet_name=sheet)
-            except:
-                continue
-            if df.empty:
-                continue
-            df.columns = df.columns.astype(str).str.strip()
-            df = df.loc[:, ~df.columns.duplicated()].fillna("")
-            fid_col = get_column_name(df, "feature_id")
-            fname_col = get_column_name(df, "feature_name")
+            df, fid_col, fname_col = normalize_feature_frame(snapshot[sheet])
             if not fid_col:
                 continue
-            df[fid_col] = df[fid_col].astype(str).str.strip()
-            if fname_col:
-                df[fname_col] = df[fname_col].astype(str).str.strip()
-            q = str(query).strip()
+            # Match on Feature_ID first, then fall back to Feature_Name
             filtered = df[df[fid_col] == q]
             if filtered.empty and fname_col:
                 filtered = df[df[fname_col].str.lower() == q.lower()]
             if not filtered.empty:
                 keep_cols = [c for c in filtered.columns
                              if c.strip().lower() not in EXCLUDED_DISPLAY_COLS]
-                df_clean = filtered[keep_cols]
-
-                # 🔥 TRANSPOSE (make fields vertical)
-                df_clean = df_clean.T
-
-                # Optional: rename columns nicely
-                df_clean.columns = [f"Record {i+1}" for i in range(len(df_clean.columns))]
-
-                # Optional: label first column
-                df_clean.index.name = "Field"
-
-                sheets_data[sheet] = df_clean
+                sheets_data[sheet] = filtered[keep_cols]
     except Exception:
         return redirect("/search")
 
     if not sheets_data:
         return redirect("/search")
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        for sheet_name, df_sheet in sheets_data.items():
-            df_sheet.to_excel(writer, sheet_name=sheet_name[:31], index=True)
-    output.seek(0)
-
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=f"Feature_{query}_results.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if request.args.get("format") == "csv":
+        # One row per record, tagged with the sheet it came from
+        columns = []
+        for df_sheet in sheets_data.values():
+            columns += [c for c in df_sheet.columns if c not in columns]
+        rows = (
+            [sheet_name] + [record.get(c, "") for c in columns]
+            for sheet_name, df_sheet in sheets_data.items()
+            for record in df_sheet.to_dict(orient="records")
+        )
+        return download_response(stream_csv(["Sheet"] + columns, rows), f"Feature_{query}_results.csv", "text/csv")
+
+    def transposed(df_sheet):
+        # 🔥 TRANSPOSE (make fields vertical): one row per field, one column per record
+        yield ["Field"] + [f"Record {i+1}" for i in range(len(df_sheet))]
+        for col in df_sheet.columns:
+            yield [col] + list(df_sheet[col])
+
+    return download_response(
+        stream_xlsx([(sheet_name, transposed(df_sheet)) for sheet_name, df_sheet in sheets_data.items()]),
+        f"Feature_{query}_results.xlsx",
+        XLSX_MIMETYPE
     )
 
 
@@ -751,31 +3062,17 @@ def ca_history(ca_name):
     if ca_name not in CA_SHEETS:
         return "Invalid CA", 404
 
-    rows = []
+    from urllib.parse import quote
+    download_url = f"/history/ca/{quote(ca_name, safe='')}/download"
     ca_excel = get_ca_excel_path(ca_name)
 
-    if ca_excel and os.path.exists(ca_excel):
-        try:
-            xls = pd.ExcelFile(ca_excel)
-            for sheet in ["Grooming", "Implementation"]:
-                if sheet in xls.sheet_names:
-                    df = pd.read_excel(ca_excel, sheet_name=sheet)
-                    if not df.empty:
-                        df["record_type"] = sheet
-                        rows.extend([filter_record(r) for r in df.to_dict(orient="records")])
-        except:
-            pass
-    elif os.path.exists(EXCEL_PATH):
-        # Fallback: read from main Excel CA sheet
-        try:
-            df = pd.read_excel(EXCEL_PATH, sheet_name=ca_name)
-            rows = [filter_record(r) for r in df.to_dict(orient="records")]
-        except:
-            pass
-
-    from urllib.parse import quote
-    download_url = f"/history/ca/{quote(ca_name, safe='')}/download" if rows else None
-    return render_template("history_table.html", title=f"{ca_name} History", rows=rows, download_url=download_url)
+    if ca_excel and workbook_exists(ca_excel):
+        return render_history(
+            f"{ca_name} History", ["Grooming", "Implementation"], excel_path=ca_excel,
+            record_type=True, download_url=download_url
+        )
+    # Fallback: read from main Excel CA sheet
+    return render_history(f"{ca_name} History", [ca_name], download_url=download_url)
 
 
 # ================= CA HISTORY DOWNLOAD =================
@@ -784,104 +3081,491 @@ def ca_history_download(ca_name):
     if ca_name not in CA_SHEETS:
         return "Invalid CA", 404
 
-    output = BytesIO()
     ca_excel = get_ca_excel_path(ca_name)
 
-    if ca_excel and os.path.exists(ca_excel):
-        try:
-            xls = pd.ExcelFile(ca_excel)
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                for sheet in xls.sheet_names:
-                    if sheet.strip().lower() == "notes":
-                        continue
-                    df = pd.read_excel(ca_excel, sheet_name=sheet)
-                    keep_cols = [c for c in df.columns if c.strip().lower() not in EXCLUDED_DISPLAY_COLS]
-                    df[keep_cols].to_excel(writer, sheet_name=sheet[:31], index=False)
-        except:
-            return redirect(f"/history/ca/{ca_name}")
-    elif os.path.exists(EXCEL_PATH):
-        try:
-            df = pd.read_excel(EXCEL_PATH, sheet_name=ca_name)
-            keep_cols = [c for c in df.columns if c.strip().lower() not in EXCLUDED_DISPLAY_COLS]
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                df[keep_cols].to_excel(writer, sheet_name=ca_name[:31], index=False)
-        except:
-            return redirect(f"/history/ca/{ca_name}")
+    if ca_excel and workbook_exists(ca_excel):
+        excel_path = ca_excel
+        sheets = [s for s in sheet_names(ca_excel) if s.strip().lower() != "notes"]
+    elif workbook_exists() and ca_name in sheet_names():
+        excel_path = None
+        sheets = [ca_name]
     else:
         return redirect(f"/history/ca/{ca_name}")
 
-    output.seek(0)
+    layout = workbook_layout(excel_path)
+    columns = {
+        sheet: [c for c in layout[sheet] if c.strip().lower() not in EXCLUDED_DISPLAY_COLS]
+        for sheet in sheets
+    }
     safe_name = ca_name.replace("&", "and").replace(" ", "_")
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=f"{safe_name}_History.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    if request.args.get("format") == "csv":
+        # All sheets in one table; record_type tells which sheet a row came from
+        header = []
+        for sheet in sheets:
+            header += [c for c in columns[sheet] if c not in header]
+        tag_rows = "record_type" not in header
+        if tag_rows:
+            header.append("record_type")
+        rows = (
+            [sheet if tag_rows and c == "record_type" else data.get(c) for c in header]
+            for sheet, data in iter_rows(sheets, excel_path)
+        )
+        return download_response(stream_csv(header, rows), f"{safe_name}_History.csv", "text/csv")
+
+    def sheet_rows(sheet):
+        yield columns[sheet]
+        for _, data in iter_rows([sheet], excel_path):
+            yield [data.get(c) for c in columns[sheet]]
+
+    return download_response(
+        stream_xlsx([(sheet, sheet_rows(sheet)) for sheet in sheets]),
+        f"{safe_name}_History.xlsx",
+        XLSX_MIMETYPE
     )
 
 # ================= DELETE =================
 @app.route("/delete/<sheet>/<feature_id>", methods=["POST"])
 def delete_record(sheet, feature_id):
 
-    if not os.path.exists(EXCEL_PATH):
+    if not workbook_exists():
         return redirect("/search")
 
-    feature_id = str(feature_id).strip()
+    # ✅ Main sheet (Grooming / Implementation / Final), Notes, the CA sheets
+    # inside the main workbook and the same sheet in each CA-specific file —
+    # but only the places that actually hold the feature are touched
+    locations = [(EXCEL_PATH, sheet), (EXCEL_PATH, "Notes")]
+    locations += [(EXCEL_PATH, ca_name) for ca_name in CA_SHEETS]
+    locations += [
+        (os.path.join(DATA_DIR, f"CA_{safe_name}.xlsx"), sheet)
+        for safe_name in CA_FILE_MAP.values()
+    ]
+    delete_feature(feature_id, locations)
 
-    def delete_from_file(file_path, target_sheet):
-        if not os.path.exists(file_path):
-            return
+    return redirect("/search")
 
+
+# ================= BATCH ESTIMATION API =================
+API_MAX_STORIES = 5000
+
+@app.route("/api/v1/estimate/<model_type>", methods=["POST"])
+def api_estimate(model_type):
+    """
+    Estimate a list of user stories in one call.
+
+    Body:
+        {
+          "stories": [
+            {"Feature_ID": "F1", "Feature_Name": "...", "User_Story_Name": "...", "CA": "TRSOAM",
+             "features": {"UserStory_No": 3, "Story_Complexity": 2, ...},
+             "notes": {"Story_Complexity": "optional note"}}
+          ],
+          "persist": false
+        }
+
+    Stories are grouped by CA and predicted with one call per CA model.
+    With "persist": true all rows (and notes) are saved in a single batch.
+    """
+    if model_type not in ESTIMATION_TYPES:
+        return jsonify(error=f"Unknown estimation type '{model_type}'"), 404
+
+    payload = request.get_json(silent=True)
+    stories = payload.get("stories") if isinstance(payload, dict) else None
+    if not isinstance(stories, list) or not stories:
+        return jsonify(error="Body must be a JSON object with a non-empty 'stories' list"), 400
+    if len(stories) > API_MAX_STORIES:
+        return jsonify(error=f"At most {API_MAX_STORIES} stories per request"), 400
+    if not all(isinstance(story, dict) for story in stories):
+        return jsonify(error="Each story must be a JSON object"), 400
+
+    def feature_getter(story):
+        # Features may be nested under "features" or given directly on the story
+        features = story.get("features")
+        if not isinstance(features, dict):
+            features = story
+        return lambda f: features.get(f, 0)
+
+    predictions = predict_efforts(
+        model_type,
+        [(str(story.get("CA", "")).strip(), feature_getter(story)) for story in stories]
+    )
+
+    config = ESTIMATION_TYPES[model_type]
+    persist = bool(payload.get("persist", False))
+    batch = WriteBatch()
+    results = []
+
+    for index, (story, (effort, input_data, is_ca_specific)) in enumerate(zip(stories, predictions)):
+        feature_id = str(story.get("Feature_ID", "")).strip()
+        ca_value = str(story.get("CA", "")).strip()
+        results.append({
+            "index": index,
+            "Feature_ID": feature_id,
+            "CA": ca_value,
+            "effort": effort,
+            "ca_specific_model": is_ca_specific,
+        })
+
+        if persist:
+            row = estimation_row(
+                model_type,
+                feature_id,
+                str(story.get("Feature_Name", "")).strip(),
+                str(story.get("User_Story_Name", "")).strip(),
+                ca_value,
+                effort,
+                input_data
+            )
+            add_estimation_rows(batch, model_type, row)
+
+            notes = story.get("notes")
+            for field, note_value in (notes.items() if isinstance(notes, dict) else []):
+                note_value = str(note_value).strip()
+                if note_value:
+                    batch.add("Notes", {
+                        "Feature_ID": feature_id,
+                        "Sheet": config["sheet"],
+                        "Field_Name": f"{config['prefix']}_{field}",
+                        "Note": clean_note(note_value),
+                        "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
+
+    batch.commit()
+
+    return jsonify(model_type=model_type, count=len(results), persisted=persist, results=results)
+
+# ================= BULK IMPORT =================
+IMPORT_CHUNK_SIZE = 1000
+# What a malformed CSV/XLSX upload raises while it is read
+IMPORT_READ_ERRORS = (ValueError, KeyError, zipfile.BadZipFile, InvalidFileException)
+
+def iter_import_chunks(fileobj, filename, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Stream a CSV or XLSX file as lists of row dicts, chunk_size rows at a time,
+    so memory stays bounded however large the file is.
+    The first row holds the column names (the feature names of the model).
+    """
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
         try:
-            df = pd.read_excel(file_path, sheet_name=target_sheet)
-        except Exception:
-            return  # Sheet may not exist → skip
+            rows = wb.active.iter_rows(values_only=True)
+            header = ["" if h is None else str(h).strip() for h in next(rows, ())]
+            chunk = []
+            for values in rows:
+                if all(v is None for v in values):
+                    continue
+                chunk.append(dict(zip(header, values)))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            wb.close()
+    else:
+        for df in pd.read_csv(fileobj, chunksize=chunk_size, dtype=str, skipinitialspace=True):
+            df.columns = df.columns.astype(str).str.strip()
+            yield df.to_dict(orient="records")
+
+def _import_value(story, name):
+    """Case-insensitive lookup in an imported row; blank cells read as 0."""
+    value = story.get(name.lower())
+    if value is None and name == "UserStory_No":
+        # Older sheets use the model's original column name
+        value = story.get("no_of_userstories")
+    if value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == "":
+        return 0
+    return value
+
+def _import_text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value).strip()
+
+def import_estimates(model_type, chunks):
+    """
+    Predict and store imported user stories chunk by chunk.
+    Each chunk is predicted with one vectorized call per CA model and saved
+    with one bulk write. Yields the number of rows imported per chunk.
+    """
+    for chunk in chunks:
+        stories = [
+            {str(k).strip().lower(): v for k, v in raw.items() if k}
+            for raw in chunk
+        ]
+        predictions = predict_efforts(
+            model_type,
+            [
+                (_import_text(story.get("ca")), lambda f, story=story: _import_value(story, f))
+                for story in stories
+            ]
+        )
+
+        with WriteBatch() as batch:
+            for story, (effort, input_data, _) in zip(stories, predictions):
+                row = estimation_row(
+                    model_type,
+                    _import_text(story.get("feature_id")),
+                    _import_text(story.get("feature_name")),
+                    _import_text(story.get("user_story_name")),
+                    _import_text(story.get("ca")),
+                    effort,
+                    input_data
+                )
+                add_estimation_rows(batch, model_type, row)
+
+        yield len(stories)
+
+@app.route("/api/v1/import/<model_type>", methods=["POST"])
+def api_import(model_type):
+    """
+    Upload a CSV/XLSX of user stories (multipart field "file"), one story per row
+    with the same columns as the grooming/implementation inputs plus
+    Feature_ID, Feature_Name, User_Story_Name and CA. Every row is estimated and saved.
+    A file that cannot be read is rejected (400) before any row is saved.
+    """
+    if model_type not in ESTIMATION_TYPES:
+        return jsonify(error=f"Unknown estimation type '{model_type}'"), 404
 
-        if df.empty:
-            return
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify(error="Upload a CSV or XLSX file in the 'file' field"), 400
+    if not upload.filename.lower().endswith((".csv", ".xlsx", ".xlsm")):
+        return jsonify(error="Only .csv and .xlsx files are supported"), 400
 
-        df.columns = df.columns.str.strip()
+    chunk_size = max(request.args.get("chunk_size", IMPORT_CHUNK_SIZE, type=int), 1)
 
-        # Find feature_id column (case-insensitive)
-        feature_id_col = None
-        for col in df.columns:
-            if col.strip().lower() == "feature_id":
-                feature_id_col = col
-                break
+    # Read the whole file once before saving anything, so a file that is
+    # broken halfway through is rejected without leaving part of it stored
+    try:
+        for _ in iter_import_chunks(upload.stream, upload.filename, chunk_size):
+            pass
+    except IMPORT_READ_ERRORS as e:
+        return jsonify(error=f"Could not read file: {e}", imported=0, partial=False), 400
+    upload.stream.seek(0)
 
-        if not feature_id_col:
-            return
+    imported = chunks = 0
+    try:
+        for count in import_estimates(model_type, iter_import_chunks(upload.stream, upload.filename, chunk_size)):
+            imported += count
+            chunks += 1
+    except IMPORT_READ_ERRORS as e:
+        # Chunks are saved as they go: the first `imported` rows are stored
+        return jsonify(
+            error=f"Import stopped after {imported} rows: {e}",
+            imported=imported,
+            partial=imported > 0,
+            resume_after_row=imported,
+        ), 400
+
+    return jsonify(model_type=model_type, imported=imported, chunks=chunks)
+
+
+# ================= PREDICTION CACHE STATS =================
+@app.route("/api/v1/prediction-cache", methods=["GET", "DELETE"])
+def prediction_cache_stats():
+    """
+    Hit/miss counters of the prediction cache; DELETE empties it and, like
+    the other admin operations, requires EFFORT_ADMIN_TOKEN.
+    """
+    if request.method == "DELETE":
+        if not _is_admin():
+            return jsonify(error="Forbidden"), 403
+        prediction_cache.clear()
+    return jsonify(prediction_cache.stats())
 
-        df[feature_id_col] = df[feature_id_col].astype(str).str.strip()
 
-        # Remove matching row
-        df = df[df[feature_id_col] != feature_id]
+# ================= MODEL RELOAD =================
+# Replacing a *.pkl is picked up without a restart: on the next request that
+# uses it (in the background), by the watcher thread when
+# EFFORT_MODEL_WATCH_INTERVAL is set, or on demand via /admin/models/reload.
+MODEL_WATCH_INTERVAL = float(os.environ.get("EFFORT_MODEL_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.environ.get("EFFORT_ADMIN_TOKEN", "")
 
-        # Save back
-        with pd.ExcelWriter(file_path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
-            df.to_excel(writer, sheet_name=target_sheet, index=False)
 
-    # ✅ 1. Delete from main sheet (Grooming / Implementation / Final)
-    delete_from_file(EXCEL_PATH, sheet)
+def reload_models(force=False):
+    """Reload every model file that changed; returns {file name: status}."""
+    return {os.path.basename(path): model_registry.reload(path, force=force) for path in model_file_paths()}
 
-    # ✅ 2. Delete from Notes sheet
-    delete_from_file(EXCEL_PATH, "Notes")
 
-    # ✅ 3. Delete from CA-specific Excel files
-    CA_FILE_SUFFIX = ["FastPathEngine", "TRSOAM", "SandA", "External"]
+def _watch_models():
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        for name, status in reload_models().items():
+            if status == "reloaded":
+                print(f"Reloaded model {name}")
 
-    for ca in CA_FILE_SUFFIX:
-        ca_path = os.path.join(BASE_DIR, f"CA_{ca}.xlsx")
-        delete_from_file(ca_path, sheet)
 
-    # ✅ 4. Delete from CA sheets inside main Excel file
-    CA_SHEETS = ["Fast Path Engine", "TRSOAM", "S&A", "External"]
+def start_model_watcher():
+    if MODEL_WATCH_INTERVAL > 0:
+        threading.Thread(target=_watch_models, name="model-watcher", daemon=True).start()
 
-    for ca_name in CA_SHEETS:
-        delete_from_file(EXCEL_PATH, ca_name)
 
-    return redirect("/search")
+def _is_admin():
+    token = request.headers.get("X-Admin-Token", "")
+    if not token and request.headers.get("Authorization", "").startswith("Bearer "):
+        token = request.headers["Authorization"][len("Bearer "):]
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.route("/admin/models", methods=["GET"])
+@app.route("/admin/models/reload", methods=["POST"])
+def admin_models():
+    """
+    GET lists the loaded models; POST reloads the changed ones (all of them
+    with ?force=1) and reports what happened to each file.
+    Requires EFFORT_ADMIN_TOKEN, sent as X-Admin-Token or a Bearer token.
+    """
+    if not _is_admin():
+        return jsonify(error="Forbidden"), 403
+    if request.method == "POST":
+        results = reload_models(force=request.args.get("force") == "1")
+        return jsonify(results=results, models=model_registry.status())
+    return jsonify(models=model_registry.status())
+
+
+# ================= HEALTH =================
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify(status="ok", ready=warmup_status["ready"])
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 200 only once every model has been loaded and warmed up."""
+    if not warmup_status["ready"]:
+        return jsonify(status="warming up", **warmup_status), 503
+    return jsonify(status="ready", **warmup_status)
+
+
+# ================= METRICS ENDPOINT =================
+@app.route("/metrics")
+def metrics():
+    """Span and request histograms in the Prometheus text format."""
+    lines = span_seconds.render() + request_seconds.render()
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+# ================= PROFILING =================
+# Opt-in profiles of single live requests. With EFFORT_PROFILING=1, a request
+# sent with `X-Profile: 1` (or ?profile=1) runs its view under cProfile and
+# the stats are saved to EFFORT_PROFILE_DIR as <time>-<endpoint>-<ms>.prof
+# (open it with snakeviz, or flameprof for a flame graph) next to a .txt
+# summary. Only one request is profiled at a time, at most one every
+# EFFORT_PROFILE_INTERVAL seconds, and the newest EFFORT_PROFILE_KEEP are
+# kept. When EFFORT_ADMIN_TOKEN is set, the request must also carry it.
+PROFILING = os.environ.get("EFFORT_PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("EFFORT_PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_INTERVAL = float(os.environ.get("EFFORT_PROFILE_INTERVAL", "60"))
+PROFILE_KEEP = int(os.environ.get("EFFORT_PROFILE_KEEP", "50"))
+
+_profile_lock = threading.Lock()
+_last_profile = None
+
+
+def _profile_requested():
+    wanted = request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1"
+    return wanted and (not ADMIN_TOKEN or _is_admin())
+
+
+def _claim_profiler():
+    """Take the profiler slot, unless a profile is running or the last one was too recent."""
+    global _last_profile
+    if not _profile_lock.acquire(blocking=False):
+        return False
+    now = time.monotonic()
+    if _last_profile is not None and now - _last_profile < PROFILE_INTERVAL:
+        _profile_lock.release()
+        return False
+    _last_profile = now
+    return True
+
+
+def save_profile(profiler, endpoint, elapsed):
+    """Write the .prof and .txt files, drop the oldest beyond PROFILE_KEEP; returns the .prof name."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = re.sub(r"[^\w.-]", "_", endpoint or "none")
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{endpoint}-{elapsed * 1000:.0f}ms"
+    path = os.path.join(PROFILE_DIR, name + ".prof")
+    profiler.dump_stats(path)
+    with open(os.path.join(PROFILE_DIR, name + ".txt"), "w", encoding="utf-8") as f:
+        pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(40)
+
+    profiles = sorted(p for p in os.listdir(PROFILE_DIR) if p.endswith(".prof"))
+    for old in profiles[:max(len(profiles) - PROFILE_KEEP, 0)]:
+        for old_path in (os.path.join(PROFILE_DIR, old), os.path.join(PROFILE_DIR, old[:-5] + ".txt")):
+            if os.path.exists(old_path):
+                os.remove(old_path)
+    return name + ".prof"
+
+
+def profiled(view):
+    """Wrap a view so a profile request runs it under cProfile (see PROFILING)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _profile_requested():
+            return view(*args, **kwargs)
+        if not _claim_profiler():
+            response = app.make_response(view(*args, **kwargs))
+            response.headers["X-Profile"] = "skipped (rate limited)"
+            return response
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            result = profiler.runcall(view, *args, **kwargs)
+        finally:
+            try:
+                name = save_profile(profiler, request.endpoint, time.perf_counter() - started)
+            except OSError as e:
+                print(f"Warning: Could not save profile: {e}")
+                name = "not saved"
+            finally:
+                _profile_lock.release()
+        response = app.make_response(result)
+        response.headers["X-Profile"] = name
+        return response
+    return wrapper
+
+
+def install_profiler():
+    if PROFILING:
+        for endpoint, view in app.view_functions.items():
+            if endpoint != "static":
+                app.view_functions[endpoint] = profiled(view)
+
+
+# ================= BACKGROUND TASKS =================
+# Warm-up, the model watcher and the journal flusher are started by the first
+# request a process serves, not at import: scripts and `flask` commands that
+# import the app don't load every model, and a server that imports the app
+# before forking its workers (gunicorn --preload) starts them in each worker,
+# where the threads actually run.
+_background_pid = None
+_background_lock = threading.Lock()
+
+
+def start_background_tasks():
+    """Start this process's background threads (once per process)."""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+    start_warm_up()
+    start_model_watcher()
+    start_journal_flusher()
+
+
+@app.before_request
+def _start_background_tasks():
+    start_background_tasks()
+
 
+install_profiler()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
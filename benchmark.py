@@ -0,0 +1,316 @@
+"""
+Benchmarks for the estimation and history paths.
+
+For each size, synthetic workbooks with the current sheet layout (Grooming,
+Implementation, Final, Notes, the CA sheets and the CA_*.xlsx files) are
+generated in a temporary data directory (EFFORT_DATA_DIR), and the Flask
+test client drives /grooming, /implementation, /final, /search, /edit and
+/delete against them. Every size runs in its own process, so peak RSS is
+per size. Results (p50/p95/p99 latency, throughput, peak RSS) are printed
+and saved as JSON to compare between commits.
+
+    python benchmark.py
+    python benchmark.py --sizes 1000 10000 100000 --requests 300
+    python benchmark.py --compare benchmark_results/20260101-120000-abc1234.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmark_results")
+
+
+# ================= SYNTHETIC DATA =================
+def _sheet_headers(path):
+    """Header row of every sheet of a workbook, so synthetic data keeps the real layout."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {
+            ws.title: [cell.value for cell in next(ws.iter_rows(max_row=1))]
+            for ws in workbook.worksheets
+        }
+    finally:
+        workbook.close()
+
+
+def _fake_row(header, rng, feature_id, ca_value, record_type=None):
+    row = []
+    for col in header:
+        key = str(col).strip().lower()
+        if key == "ca":
+            row.append(ca_value)
+        elif key == "feature_id":
+            row.append(feature_id)
+        elif key == "feature_name":
+            row.append(f"Feature {feature_id}")
+        elif key in ("time",):
+            row.append("2026-01-01 10:00:00")
+        elif key == "record_type":
+            row.append(record_type)
+        elif key.endswith("effort"):
+            row.append(round(rng.uniform(5, 120), 2))
+        elif key == "sheet":
+            row.append(rng.choice(["Grooming", "Implementation"]))
+        elif key == "field_name":
+            row.append("G_Story_Complexity")
+        elif key == "note":
+            row.append("synthetic note")
+        else:
+            row.append(rng.randint(0, 5))
+    return row
+
+
+def generate_workbooks(data_dir, rows, ca_files, seed=0):
+    """
+    Write the main workbook and the CA workbooks with `rows` rows in
+    Grooming and Implementation (Final gets half, Notes a tenth, and every
+    CA row is copied to its CA sheet and CA file, as the app does).
+    """
+    import openpyxl
+
+    rng = random.Random(seed)
+    main_name = "Effort_Estimation_Grooming_Implementation_FINAL.xlsx"
+    layout = _sheet_headers(os.path.join(BASE_DIR, main_name))
+    ca_layout = _sheet_headers(os.path.join(BASE_DIR, f"CA_{next(iter(ca_files.values()))}.xlsx"))
+    ca_names = list(ca_files)
+
+    main = openpyxl.Workbook(write_only=True)
+    sheets = {title: main.create_sheet(title) for title in layout}
+    ca_books = {ca: openpyxl.Workbook(write_only=True) for ca in ca_names}
+    ca_sheets = {
+        ca: {title: book.create_sheet(title) for title in ca_layout}
+        for ca, book in ca_books.items()
+    }
+    for title, ws in sheets.items():
+        ws.append(layout[title])
+    for ca in ca_names:
+        for title, ws in ca_sheets[ca].items():
+            ws.append(ca_layout[title])
+
+    for sheet_name in ("Grooming", "Implementation"):
+        for i in range(rows):
+            feature_id, ca_value = f"BF{i}", rng.choice(ca_names)
+            sheets[sheet_name].append(_fake_row(layout[sheet_name], rng, feature_id, ca_value))
+            ca_sheets[ca_value][sheet_name].append(_fake_row(ca_layout[sheet_name], rng, feature_id, ca_value))
+            if ca_value in sheets:
+                sheets[ca_value].append(_fake_row(layout[ca_value], rng, feature_id, ca_value, sheet_name))
+    for i in range(rows // 2):
+        sheets["Final"].append(_fake_row(layout["Final"], rng, f"BF{i}", ""))
+    for i in range(rows // 10):
+        sheets["Notes"].append(_fake_row(layout["Notes"], rng, f"BF{i}", ""))
+
+    main.save(os.path.join(data_dir, main_name))
+    for ca, book in ca_books.items():
+        book.save(os.path.join(data_dir, f"CA_{ca_files[ca]}.xlsx"))
+
+
+# ================= MEASUREMENT =================
+def summarize(latencies, elapsed):
+    import numpy as np
+
+    ms = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+
+
+def timed(results, name, count, fn):
+    """Call fn(i) count times and store the latency summary under name."""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    results[name] = summarize(latencies, time.perf_counter() - started)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_size(rows, requests):
+    """Benchmark one size inside this process (EFFORT_DATA_DIR must already be set)."""
+    setup = {}
+    started = time.perf_counter()
+    import app as effort_app
+    setup["import_app_s"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    generate_workbooks(effort_app.DATA_DIR, rows, effort_app.CA_FILE_MAP)
+    setup["generate_s"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    effort_app.start_background_tasks()
+    effort_app._warmup_done.wait()
+    setup["warmup_wait_s"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    effort_app._ensure_workbook(effort_app.EXCEL_PATH)
+    for ca_value in effort_app.CA_FILE_MAP:
+        effort_app._ensure_workbook(effort_app.get_ca_excel_path(ca_value))
+    setup["first_load_s"] = round(time.perf_counter() - started, 3)
+
+    client = effort_app.app.test_client()
+
+    def ok(response):
+        # A benchmark of error pages is worthless, so stop at the first one
+        if response.status_code >= 400:
+            raise SystemExit(f"{response.request.method} {response.request.path} -> {response.status_code}")
+        return response
+    rng = random.Random(1)
+    ca_values = list(effort_app.CA_FILE_MAP)
+    results = {}
+
+    def estimate_form(model_type, feature_id):
+        prefix = effort_app.ESTIMATION_TYPES[model_type]["prefix"]
+        form = {
+            "Feature_ID": feature_id,
+            "Feature_Name": f"Feature {feature_id}",
+            "User_Story_Name": "Benchmark story",
+            "CA": rng.choice(ca_values),
+        }
+        for name in effort_app.form_fields(model_type):
+            form[f"{prefix}_{name}"] = str(rng.randint(0, 5))
+        form[f"{prefix}_Story_Complexity_note"] = "benchmark note"
+        return form
+
+    # -------- micro-benchmarks --------
+    timed(results, "load_ca_model", requests, lambda i: effort_app.load_ca_model(
+        rng.choice(ca_values), rng.choice(["grooming", "implementation"])
+    ))
+    timed(results, "save_to_sheet", requests, lambda i: effort_app.save_to_sheet(
+        "Final", {"feature_id": f"MICRO{i}", "final_effort": 1.0}
+    ))
+
+    # -------- endpoints --------
+    timed(results, "POST /grooming", requests, lambda i: ok(client.post(
+        "/grooming", data=estimate_form("grooming", f"NEW{i}")
+    )))
+    timed(results, "POST /implementation", requests, lambda i: ok(client.post(
+        "/implementation", data=estimate_form("implementation", f"NEW{i}")
+    )))
+    timed(results, "POST /final", requests, lambda i: ok(client.post(
+        "/final", data={"feature_id": f"BF{rng.randrange(rows)}", "action": "calculate"}
+    )))
+    timed(results, "POST /search", requests, lambda i: ok(client.post(
+        "/search", data={"query": f"BF{rng.randrange(rows)}"}
+    )))
+    timed(results, "GET /edit", requests, lambda i: ok(client.get(
+        f"/edit/Grooming/BF{rng.randrange(rows)}"
+    )))
+    timed(results, "POST /edit", requests, lambda i: ok(client.post(
+        f"/edit/Grooming/BF{rng.randrange(rows)}", data={"Feature_Name": f"Edited {i}"}
+    )))
+    timed(results, "GET /history/grooming", requests, lambda i: ok(client.get("/history/grooming")))
+    timed(results, "POST /delete", requests, lambda i: ok(client.post(f"/delete/Grooming/NEW{i}")))
+
+    return {"rows": rows, "setup": setup, "results": results, "peak_rss_mb": peak_rss_mb()}
+
+
+# ================= RUNNER =================
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_in_subprocess(rows, requests):
+    with tempfile.TemporaryDirectory(prefix=f"effort-bench-{rows}-") as data_dir:
+        env = dict(os.environ, EFFORT_DATA_DIR=data_dir)
+        # The .xlsx exports are not part of what is measured here
+        env.setdefault("EFFORT_EXPORT_INTERVAL", "3600")
+        out_path = os.path.join(data_dir, "result.json")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(rows),
+             "--requests", str(requests), "--worker-output", out_path],
+            env=env, check=True
+        )
+        with open(out_path) as f:
+            return json.load(f)
+
+
+def print_report(report, baseline=None):
+    base = {}
+    if baseline:
+        base = {(str(size["rows"]), name): stats
+                for size in baseline["sizes"] for name, stats in size["results"].items()}
+    for size in report["sizes"]:
+        setup = ", ".join(f"{k}={v}" for k, v in size["setup"].items())
+        print(f"\n== {size['rows']} rows  (peak RSS {size['peak_rss_mb']} MB; {setup})")
+        print(f"{'operation':24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}" + ("  p50 vs base" if base else ""))
+        for name, stats in size["results"].items():
+            line = (f"{name:24} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                    f"{stats['p99_ms']:9.2f} {stats['throughput_rps']:9.1f}")
+            previous = base.get((str(size["rows"]), name))
+            if previous and previous["p50_ms"]:
+                line += f"  {stats['p50_ms'] / previous['p50_ms']:.2f}x"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the estimation and history paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="rows per Grooming/Implementation sheet (default: 1000 10000)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per operation (default 200)")
+    parser.add_argument("--output", help="where to save the JSON results (default: benchmark_results/)")
+    parser.add_argument("--compare", help="earlier results file to compare p50 latencies with")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        result = run_size(args.worker, args.requests)
+        with open(args.worker_output, "w") as f:
+            json.dump(result, f)
+        # Skip the exit-time export of the synthetic workbooks
+        os._exit(0)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "requests": args.requests,
+        "sizes": [],
+    }
+    for rows in args.sizes:
+        print(f"Benchmarking {rows} rows...", flush=True)
+        report["sizes"].append(run_in_subprocess(rows, args.requests))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit']}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
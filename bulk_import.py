@@ -0,0 +1,42 @@
+"""
+Bulk-import user stories from a CSV or XLSX file.
+
+Each row is one user story with the same feature columns as
+grooming_input.txt / implementation_input.txt, plus Feature_ID,
+Feature_Name, User_Story_Name and CA. The file is streamed in chunks,
+each chunk is estimated per CA model and saved in one write.
+
+    python bulk_import.py grooming stories.csv
+    python bulk_import.py implementation stories.xlsx --chunk-size 5000
+"""
+import argparse
+import os
+import sys
+
+from app import ESTIMATION_TYPES, IMPORT_CHUNK_SIZE, import_estimates, iter_import_chunks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate and store user stories from a CSV/XLSX file.")
+    parser.add_argument("model_type", choices=sorted(ESTIMATION_TYPES))
+    parser.add_argument("path", help="CSV or XLSX file, one user story per row")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help=f"rows read and predicted at a time (default {IMPORT_CHUNK_SIZE})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} not found")
+
+    imported = 0
+    with open(args.path, "rb") as f:
+        chunks = iter_import_chunks(f, args.path, max(args.chunk_size, 1))
+        for count in import_estimates(args.model_type, chunks):
+            imported += count
+            print(f"Imported {imported} rows...")
+
+    print(f"Done: {imported} {args.model_type} estimates saved.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
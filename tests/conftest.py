@@ -0,0 +1,41 @@
+"""
+The app reads its configuration at import time, so the environment is set
+up here before anything imports it: workbooks and the store go to a
+temporary data directory, and no background warm-up runs.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="effort-tests-")
+
+os.environ["EFFORT_DATA_DIR"] = DATA_DIR
+os.environ["EFFORT_WARMUP"] = "0"
+# Exports are triggered explicitly by the tests that need them
+os.environ["EFFORT_EXPORT_INTERVAL"] = "3600"
+sys.path.insert(0, REPO_DIR)
+
+# Registered before the app's own exit hooks, so it runs after them
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+
+import app as effort_app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return effort_app.app.test_client()
+
+
+def row_count(feature_id, sheet_name=None):
+    """Live rows stored for a feature (optionally in one sheet), in any workbook."""
+    sql = "SELECT COUNT(*) FROM sheet_rows WHERE feature_id_key = ? AND deleted_at IS NULL"
+    params = [feature_id]
+    if sheet_name:
+        sql += " AND sheet = ?"
+        params.append(sheet_name)
+    return effort_app.get_db().execute(sql, params).fetchone()[0]
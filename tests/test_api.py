@@ -0,0 +1,72 @@
+import io
+
+from flask import template_rendered
+
+import app
+from conftest import row_count
+
+
+def _upload(client, filename, data, **query):
+    return client.post(
+        "/api/v1/import/grooming",
+        query_string=query,
+        data={"file": (io.BytesIO(data), filename)},
+        content_type="multipart/form-data",
+    )
+
+
+def test_import_rejects_corrupt_xlsx(client):
+    response = _upload(client, "stories.xlsx", b"PK\x03\x04 not really a zip file")
+    assert response.status_code == 400
+    assert response.get_json()["imported"] == 0
+
+
+def test_import_saves_nothing_when_a_later_row_is_broken(client):
+    csv = (
+        "Feature_ID,Feature_Name,CA,Story_Complexity\n"
+        "IMPBAD1,First,TRSOAM,3\n"
+        "IMPBAD2,Second,TRSOAM,2\n"
+        'IMPBAD3,"Unclosed,TRSOAM,1\n'
+    ).encode()
+    response = _upload(client, "stories.csv", csv, chunk_size=1)
+    assert response.status_code == 400
+    assert response.get_json()["partial"] is False
+    assert row_count("IMPBAD1") == 0
+
+
+def test_import_saves_every_row(client):
+    csv = b"Feature_ID,Feature_Name,CA,Story_Complexity\nIMPOK1,First,TRSOAM,3\nIMPOK2,Second,,2\n"
+    response = _upload(client, "stories.csv", csv)
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 2
+    assert row_count("IMPOK1", "Grooming") >= 1
+
+
+def test_clearing_prediction_cache_needs_admin_token(client, monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    app.prediction_cache.put_many([(("TRSOAM", "grooming", "digest", (1.0,)), 5.0)])
+    size = app.prediction_cache.stats()["size"]
+
+    assert client.get("/api/v1/prediction-cache").status_code == 200
+    assert client.delete("/api/v1/prediction-cache").status_code == 403
+    assert client.delete("/api/v1/prediction-cache", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert app.prediction_cache.stats()["size"] == size
+
+    response = client.delete("/api/v1/prediction-cache", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert app.prediction_cache.stats()["size"] == 0
+
+
+def test_search_shows_blank_values_as_placeholders(client):
+    with app.WriteBatch() as batch:
+        batch.add("Grooming", {"Feature_ID": "SRCH1", "Feature_Name": "", "grooming_effort": 2.5})
+        batch.add("Grooming", {"Feature_ID": "SRCH1", "CA": "TRSOAM", "Story_Complexity": 1.5, "grooming_effort": 3.0})
+    rendered = []
+    with template_rendered.connected_to(lambda sender, template, context, **extra: rendered.append(context), app.app):
+        assert client.post("/search", data={"query": "SRCH1"}).status_code == 200
+
+    newest, oldest = rendered[-1]["grooming_results"]
+    assert (newest["CA"], newest["Story_Complexity"], newest["Feature_Name"]) == ("TRSOAM", 1.5, "---")
+    # Cells the row never had and empty ones alike
+    assert (oldest["CA"], oldest["Story_Complexity"], oldest["Feature_Name"]) == ("---", "---", "---")
+    assert oldest["grooming_effort"] == 2.5
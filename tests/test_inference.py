@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBRegressor
+
+import app
+
+
+@pytest.fixture(scope="module")
+def early_stopped_model():
+    rng = np.random.default_rng(0)
+    features = [f"F{i}" for i in range(6)]
+    X = pd.DataFrame(rng.integers(0, 12, size=(400, len(features))).astype(float), columns=features)
+    y = X["F0"] * 3 + X["F1"] ** 2 + rng.normal(0, 4, len(X))
+    model = XGBRegressor(n_estimators=300, max_depth=4, learning_rate=0.3, early_stopping_rounds=5)
+    model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+    assert model.best_iteration < 299
+    return model
+
+
+def _matrix(model, rows, seed=1):
+    rng = np.random.default_rng(seed)
+    matrix = rng.integers(0, 12, size=(rows, model.n_features_in_)).astype(float)
+    matrix[rng.random(matrix.shape) < 0.05] = np.nan
+    return matrix
+
+
+@pytest.mark.parametrize("backend", app.INFERENCE_BACKENDS)
+@pytest.mark.parametrize("rows", [1, app.NUMPY_MAX_ROWS, app.NUMPY_MAX_ROWS + 24])
+def test_backends_match_predict_on_early_stopped_model(early_stopped_model, backend, rows):
+    matrix = _matrix(early_stopped_model, rows)
+    expected = early_stopped_model.predict(matrix)
+    np.testing.assert_allclose(app.compile_model(early_stopped_model, backend)(matrix), expected, atol=1e-3)
+
+
+@pytest.mark.parametrize("backend", app.INFERENCE_BACKENDS)
+def test_backends_match_predict_on_shipped_models(backend):
+    for path in app.model_file_paths():
+        model = app.model_registry.get(path).model
+        matrix = _matrix(model, 50)
+        np.testing.assert_allclose(app.compile_model(model, backend)(matrix), model.predict(matrix), atol=1e-3)
@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import app
+from conftest import row_count
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    monkeypatch.setattr(app, "WRITE_BEHIND", True)
+    monkeypatch.setattr(app, "WRITE_BEHIND_INTERVAL", 3600)
+    # The tests apply the journal themselves
+    monkeypatch.setattr(app, "start_journal_flusher", lambda: None)
+    yield
+    app.sync_journal()
+
+
+def test_append_after_partial_line_is_kept(write_behind):
+    with open(app.JOURNAL_PATH, "wb") as f:
+        f.write(b'{"id": "cut-short", "groups": [["')
+
+    app.save_to_sheet("Grooming", {"Feature_ID": "JR1", "grooming_effort": 2.0})
+    assert row_count("JR1", "Grooming") == 0
+
+    assert app.flush_journal() == 1
+    assert row_count("JR1", "Grooming") == 1
+
+
+def test_flush_interrupted_before_cleanup_is_not_applied_twice(write_behind):
+    app.save_to_sheet("Grooming", {"Feature_ID": "JR2", "grooming_effort": 3.0})
+    shutil.copy(app.JOURNAL_PATH, app.JOURNAL_FLUSHING_PATH + ".copy")
+    assert app.flush_journal() == 1
+
+    # A crash between applying the batch and removing the flushing file
+    os.replace(app.JOURNAL_FLUSHING_PATH + ".copy", app.JOURNAL_FLUSHING_PATH)
+    entry_id = json.loads(open(app.JOURNAL_FLUSHING_PATH, "rb").readline())["id"]
+    app.run_write(lambda conn: conn.execute("INSERT INTO journal_applied (entry_id) VALUES (?)", (entry_id,)))
+
+    assert app.flush_journal() == 0
+    assert row_count("JR2", "Grooming") == 1
+    assert not os.path.exists(app.JOURNAL_FLUSHING_PATH)
+
+
+def test_journal_left_by_a_previous_run_is_applied_before_reads(write_behind):
+    entry = {
+        "id": "previous-run",
+        "groups": [[app.workbook_key(app.EXCEL_PATH), "Grooming", [{"Feature_ID": "JR3", "grooming_effort": 4.0}]]],
+    }
+    with open(app.JOURNAL_PATH, "w") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    assert "JR3" in set(app.read_sheet("Grooming")["Feature_ID"])
+    assert row_count("JR3", "Grooming") == 1
@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / "grooming_TRSOAM_model.pkl"
+    shutil.copy(os.path.join(app.BASE_DIR, "grooming_TRSOAM_model.pkl"), path)
+    return str(path)
+
+
+def _count_loads(monkeypatch):
+    loads = []
+    real_load = app.joblib.load
+    monkeypatch.setattr(app.joblib, "load", lambda f: loads.append(1) or real_load(f))
+    return loads
+
+
+def test_rejected_first_load_is_not_retried_until_the_file_changes(tmp_path, monkeypatch, model_path):
+    broken = tmp_path / "broken_model.pkl"
+    broken.write_bytes(b"not a pickle")
+    registry = app.ModelRegistry()
+    loads = _count_loads(monkeypatch)
+
+    for _ in range(5):
+        with pytest.raises(Exception):
+            registry.get(str(broken))
+    assert len(loads) == 1
+
+    shutil.copy(model_path, broken)
+    assert registry.get(str(broken)).features
+    assert len(loads) == 2
+
+
+def test_reload_rejects_a_predictor_that_disagrees_with_predict(monkeypatch, model_path):
+    registry = app.ModelRegistry()
+    current = registry.get(model_path)
+
+    monkeypatch.setattr(app, "get_predictor", lambda model: lambda matrix: model.predict(matrix) + 1.0)
+    status = registry.reload(model_path, force=True)
+
+    assert status.startswith("rejected: ")
+    assert "differs from predict()" in status
+    assert registry.peek(model_path) is current
+
+
+def test_check_predictor_accepts_the_shipped_models():
+    for path in app.model_file_paths():
+        app.check_predictor(app.model_registry.get(path).model)
+
+
+def test_loaded_model_keeps_serving_while_its_file_is_missing(model_path):
+    registry = app.ModelRegistry()
+    current = registry.get(model_path)
+
+    os.rename(model_path, model_path + ".old")
+    assert registry.get(model_path) is current
+    os.rename(model_path + ".old", model_path)
+
+
+def test_global_fallback_survives_a_missing_global_pickle():
+    path = os.path.join(app.BASE_DIR, app.GLOBAL_MODEL_FILES["grooming"])
+    os.rename(path, path + ".moved")
+    try:
+        model, features, is_ca_specific = app.load_ca_model("Other", "grooming")
+    finally:
+        os.rename(path + ".moved", path)
+    assert model is app.model_registry.peek(path).model
+    assert features and not is_ca_specific
+
+
+def test_shipped_models_only_use_fields_the_forms_post(client):
+    for path in app.model_file_paths():
+        app.validate_model_features(path, app.model_registry.get(path).model)
+
+    for model_type, page in (("grooming", "/grooming"), ("implementation", "/implementation")):
+        html = client.get(page).get_data(as_text=True)
+        prefix = app.ESTIMATION_TYPES[model_type]["prefix"]
+        assert "UserStory_No" in app.form_fields(model_type)
+        for name in app.form_fields(model_type):
+            assert f'name="{prefix}_{name}"' in html
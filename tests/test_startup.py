@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+import app
+
+
+def test_import_starts_no_background_threads():
+    # A fresh interpreter, as a script or `flask` command would use
+    code = "import threading, app; print(sorted(t.name for t in threading.enumerate()))"
+    env = dict(os.environ, EFFORT_WARMUP="1")
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "['MainThread']"
+
+
+def test_first_request_starts_background_tasks(client):
+    assert client.get("/readyz").status_code in (200, 503)
+    assert app._background_pid == os.getpid()
+    assert app._warmup_done.wait(timeout=60)
+    assert client.get("/readyz").status_code == 200
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import row_count
+
+
+def test_xlsx_round_trip():
+    path = os.path.join(app.DATA_DIR, "RoundTrip.xlsx")
+    grooming = pd.DataFrame({
+        "Feature_ID": ["RT2", "RT1"],
+        "Feature_Name": ["Two", "One"],
+        "grooming_effort": [12.5, 3.0],
+    })
+    notes = pd.DataFrame({"Feature_ID": ["RT1"], "Note": ["first note"]})
+    with pd.ExcelWriter(path) as writer:
+        grooming.to_excel(writer, sheet_name="Grooming", index=False)
+        notes.to_excel(writer, sheet_name="Notes", index=False)
+
+    # Imported on first use, newest row first like the sheet itself
+    assert app.sheet_names(path) == ["Grooming", "Notes"]
+    pd.testing.assert_frame_equal(app.read_sheet("Grooming", path), grooming, check_dtype=False)
+
+    app.save_to_sheet("Grooming", {"Feature_ID": "RT3", "Feature_Name": "Three", "grooming_effort": 7.25}, path)
+    app.export_workbook(app.workbook_key(path), force=True)
+
+    exported = pd.read_excel(path, sheet_name=None)
+    assert list(exported) == ["Grooming", "Notes"]
+    expected = pd.concat(
+        [pd.DataFrame({"Feature_ID": ["RT3"], "Feature_Name": ["Three"], "grooming_effort": [7.25]}), grooming],
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(exported["Grooming"], expected, check_dtype=False)
+    pd.testing.assert_frame_equal(exported["Notes"], notes, check_dtype=False)
+
+
+def _grooming_aggregate(scope, key):
+    return app.effort_aggregates(scope, key).get(key, {}).get("grooming_effort")
+
+
+def _ca_count(ca_value):
+    return (_grooming_aggregate("ca", ca_value) or {"count": 0})["count"]
+
+
+def test_append_edit_delete_keep_aggregates_in_step():
+    row = {"Feature_ID": "AGG1", "Feature_Name": "Aggregated", "CA": "TRSOAM", "grooming_effort": 10.0}
+    with app.WriteBatch() as batch:
+        batch.add("Grooming", row)
+        batch.add("Grooming", {**row, "grooming_effort": 30.0})
+    ca_before = _ca_count("TRSOAM")
+
+    assert row_count("AGG1", "Grooming") == 2
+    assert _grooming_aggregate("feature", "AGG1")["count"] == 2
+    assert _grooming_aggregate("feature", "AGG1")["sum"] == pytest.approx(40.0)
+
+    locations = [(app.EXCEL_PATH, "Grooming")]
+    assert app.update_feature("AGG1", {"grooming_effort": "5"}, locations) == 2
+    assert set(app.find_feature_rows("Grooming", feature_id="AGG1")["grooming_effort"]) == {5.0}
+    assert _grooming_aggregate("feature", "AGG1")["sum"] == pytest.approx(10.0)
+    assert _grooming_aggregate("feature", "AGG1")["p50"] == pytest.approx(5.0)
+
+    # An edit that changes nothing writes nothing
+    assert app.update_feature("AGG1", {"grooming_effort": "5"}, locations) == 0
+
+    assert app.delete_feature("AGG1", locations) == 2
+    assert row_count("AGG1") == 0
+    assert app.find_feature_rows("Grooming", feature_id="AGG1").empty
+    assert _grooming_aggregate("feature", "AGG1") is None
+    assert _ca_count("TRSOAM") == ca_before - 2